@@ -23,110 +23,291 @@
 
 punct = ('.',',','!','?',':',';','\'','"','-','/')
 
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, namedtuple
 import sys
-import codecs
-import csv
 import re
 import os
+import math
+import bisect
+import json
+import hashlib
+import tempfile
+import functools
+import contextlib
+import argparse
+import time
+import cProfile
+import pstats
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import corpus
+import data_cleaning
+import manifest as corpus_manifest
+from confusion import ConfusionMatrix
+import numpy as np # ...pip install numpy
+try:
+    import resource
+except ImportError: # not on Windows
+    resource = None
 
 def remove_tags(word):
   cleanr = re.compile('<.*?>')
   cleantext = re.sub(cleanr, '', word)
   return cleantext
 
-def worderrors(ocrdrec,mandrec):
-
-#    print ocrdrec
-#    print mandrec
+def ocrdwordgenerator(ocrd):
+    # The words of the ocr string, with their start and end positions in
+    # it. The first word of a line gets a newline in front, and a word
+    # hyphenated at the end of a line is joined with the first word of
+    # the next line.
+    halfword = ''
+    halfstart = 0
+    linestart = 0
+    for l in ocrd.split('\n'):
+        start = linestart+len(l)-len(l.lstrip())
+        linestart += len(l)+1
+        l = l.strip()
+        if not l:
+            continue
 
-    def ocrdwordgenerator(ocrd):
-        ocrdlines = ocrd.split('\n')
-        halfword = ''
-        for l in ocrdlines:
-            l = l.strip()
-            if not l:
-                continue
+        words = l.replace('\t',' ').split(' ')
+        spans = []
+        for w in words:
+            spans.append((start,start+len(w)))
+            start += len(w)+1
+        words[0] = halfword+'\n'+words[0]
+        if halfword:
+            spans[0] = (halfstart,spans[0][1])
+        if (words[-1].endswith('-') or words[-1].endswith('\xad')) and len(words[-1])>1:
+            halfword = words[-1]
+            halfstart = spans[-1][0]
+            del words[-1]
+        else:
+            halfword = ''
 
-            words = l.replace('\t',' ').split(' ')
-            words[0] = halfword+'\n'+words[0]
-            if (words[-1].endswith('-') or words[-1].endswith('\xad')) and len(words[-1])>1:
-                halfword = words[-1]
-                del words[-1]
-            else:
-                halfword = ''
+        for w,(start,end) in zip(words,spans):
+            yield w, start, end
 
-            for w in words:
-                yield w
+def mandwordgenerator(mand):
+    # The words of the manual string, with their start and end positions in it
+    for m in re.finditer(r'\S+', mand.replace('\t',' ').replace('\n',' ').replace('\u00ad','-')):
+        yield m.group(), m.start(), m.end()
 
-    mandwords = [w for w in ''.join(mandrec).replace('\t',' ').replace('\n',' ').replace('\u00ad','-').split() if w]
-    ocrdwords = [w for w in ocrdwordgenerator(''.join(ocrdrec))]
+def worderrors(ocrdrec,mandrec=None):
+    # The alignment is an Alignment (with mandrec None), or ocrdrec,
+    # mandrec as lists, see _alignment
 
-    x = len(ocrdwords)+1
-    y = len(mandwords)+1
-    Tot = [0 for _ in range(x*y)]
-    Noo = [0 for _ in range(x*y)]
-    Sub = [0 for _ in range(x*y)]
-    Ins = [0 for _ in range(x*y)]
-    Del = [0 for _ in range(x*y)]
+#    print ocrdrec
+#    print mandrec
 
-#    print ocrdwords
-#    print mandwords
+    alignment = _alignment(ocrdrec, mandrec)
+    mandwords = [w for w,_,_ in mandwordgenerator(alignment.mand_text())]
+    ocrdwords = [w for w,_,_ in ocrdwordgenerator(alignment.ocrd_text())]
+
+    return _wordalign(ocrdwords,mandwords)+(len(mandwords),)
+
+def worderrors_from_alignment(ocrdrec,mandrec=None):
+    # The same counts as worderrors, but the words are paired up by the
+    # character alignment instead of being aligned anew: ocr and manual
+    # words with characters aligned to each other are linked, and only
+    # each group of linked words (typically one ocr and one manual word,
+    # a few where words are split or joined) is aligned on word level.
+    # Unlinked manual words count as deletions, unlinked ocr words as
+    # insertions. That is one pass over the alignment instead of a
+    # matrix over all the words, but where worderrors pairs up the
+    # words differently the counts differ, see main(wordmode='validate').
+
+    alignment = _alignment(ocrdrec, mandrec)
+    ocrdtext = alignment.ocrd_text()
+    mandtext = alignment.mand_text()
+    ocrdwords = list(ocrdwordgenerator(ocrdtext))
+    mandwords = list(mandwordgenerator(mandtext))
+
+    # word index of each character position, -1 between words
+    ocrdword_at = np.full(len(ocrdtext), -1, dtype=np.int32)
+    for k,(_,start,end) in enumerate(ocrdwords):
+        ocrdword_at[start:end] = k
+    mandword_at = np.full(len(mandtext), -1, dtype=np.int32)
+    for k,(_,start,end) in enumerate(mandwords):
+        mandword_at[start:end] = k
+
+    # the words of the characters of each column with both
+    both = alignment.ops == OP_SUB
+    linked_a = ocrdword_at[alignment.ocrd_index[both]-alignment.ocrd_start]
+    linked_b = mandword_at[alignment.mand_index[both]-alignment.mand_start]
+    linked = (linked_a >= 0) & (linked_b >= 0)
+    linked_a = linked_a[linked]
+    linked_b = linked_b[linked]
+    # a pair of words like the one before it changes nothing below
+    new = np.ones(len(linked_a), dtype=bool)
+    new[1:] = (linked_a[1:] != linked_a[:-1]) | (linked_b[1:] != linked_b[:-1])
+
+    # groups of linked words, [first ocr word, last ocr word, first manual word, last manual word]
+    groups = []
+    for a,b in zip(linked_a[new].tolist(), linked_b[new].tolist()):
+        if groups and (groups[-1][1] == a or groups[-1][3] == b):
+            groups[-1][1] = a
+            groups[-1][3] = b
+        else:
+            groups.append([a,a,b,b])
+
+    # align each group, and the unlinked words between the groups, on word level
+    blocks = []
+    a = b = 0
+    for afirst, alast, bfirst, blast in groups:
+        if a < afirst or b < bfirst:
+            blocks.append((a,afirst,b,bfirst))
+        blocks.append((afirst,alast+1,bfirst,blast+1))
+        a = alast+1
+        b = blast+1
+    if a < len(ocrdwords) or b < len(mandwords):
+        blocks.append((a,len(ocrdwords),b,len(mandwords)))
+
+    tot = noo = sub = dele = ins = 0
+    for a0, a1, b0, b1 in blocks:
+        counts = _wordalign([w for w,_,_ in ocrdwords[a0:a1]], [w for w,_,_ in mandwords[b0:b1]], a0 == b0 == 0)
+        tot += counts[0]
+        noo += counts[1]
+        sub += counts[2]
+        dele += counts[3]
+        ins += counts[4]
+
+    return tot, noo, sub, dele, ins, len(mandwords)
+
+def _wordalign(ocrdwords,mandwords,origin=True):
+    # Word level edit distance between the ocr and the manual words,
+    # returns the total number of errors, correct words (no-ops),
+    # substitutions, deletions (manual words missing in the ocr) and
+    # insertions (extra ocr words). NB! On the margins of the matrix it
+    # is the other way around, e.g. extra ocr words before the first
+    # manual word count as deletions. With origin=False the words are a
+    # part in the middle of a longer alignment, and the margins count
+    # like the rest of the matrix.
+    #
+    # The words are interned as integers. An ocr word matches a manual
+    # word as is, or without its line break (with or without a hyphen
+    # before it), so each ocr word gets the ids of those variants. The
+    # matrix is filled in row by row keeping only the previous row, each
+    # cell a tuple (total, no-ops, substitutions, insertions, deletions).
 
-    for i in range(1,x):
-        Del[i] = Del[i-1]+1
-        Tot[i] = Tot[i-1]+1
+    ids = {}
+    mandids = [ids.setdefault(w,len(ids)) for w in mandwords]
+    ocrdids = [tuple({ids[v] for v in (w, w.replace('-\n',''), w.replace('\xad\n',''), w.replace('\n','')) if v in ids})
+               for w in ocrdwords]
 
-    for j in range(1,y):
-        Ins[x*j] = Ins[x*(j-1)]+1
-        Tot[x*j] = Tot[x*(j-1)]+1
+    x = len(ocrdwords)+1
+    y = len(mandwords)+1
 
+    if origin:
+        prev = [(i,0,0,0,i) for i in range(x)]
+    else:
+        prev = [(i,0,0,i,0) for i in range(x)]
     for j in range(1,y):
+        mandid = mandids[j-1]
+        left = (j,0,0,j,0) if origin else (j,0,0,0,j)
+        row = [left]
         for i in range(1,x):
-            mandword = mandwords[j-1]
-            ocrdword = ocrdwords[i-1]
-
-            if mandword == ocrdword or mandword == ocrdword.replace('-\n','') or mandword == ocrdword.replace('\xad\n','') or mandword == ocrdword.replace('\n',''):
-                ntot = Tot[(i-1)+x*(j-1)]
-                nnoo = Noo[(i-1)+x*(j-1)]+1
-                nsub = Sub[(i-1)+x*(j-1)]
-                nins = Ins[(i-1)+x*(j-1)]
-                ndel = Del[(i-1)+x*(j-1)]
+            tot, noo, sub, ins, dele = prev[i-1]
+            if mandid in ocrdids[i-1]:
+                cell = (tot, noo+1, sub, ins, dele)
             else:
-                ntot = Tot[(i-1)+x*(j-1)]+1
-                nnoo = Noo[(i-1)+x*(j-1)]
-                nsub = Sub[(i-1)+x*(j-1)]+1
-                nins = Ins[(i-1)+x*(j-1)]
-                ndel = Del[(i-1)+x*(j-1)]
+                cell = (tot+1, noo, sub+1, ins, dele)
 
             # inserts
-            down = Tot[i+x*(j-1)]+1
-            if down < ntot:
-                ntot = down
-                nnoo = Noo[i+x*(j-1)]
-                nsub = Sub[i+x*(j-1)]
-                nins = Ins[i+x*(j-1)]
-                ndel = Del[i+x*(j-1)]+1
+            up = prev[i]
+            if up[0]+1 < cell[0]:
+                cell = (up[0]+1, up[1], up[2], up[3], up[4]+1)
 
             # deletes
-            rght = Tot[(i-1)+x*j]+1
-            if rght < ntot:
-                ntot = rght
-                nnoo = Noo[(i-1)+x*j]
-                nsub = Sub[(i-1)+x*j]
-                nins = Ins[(i-1)+x*j]+1
-                ndel = Del[(i-1)+x*j]
-
-            Tot[i+x*j] = ntot
-            Noo[i+x*j] = nnoo
-            Sub[i+x*j] = nsub
-            Del[i+x*j] = ndel
-            Ins[i+x*j] = nins
-
-    return Tot[-1],Noo[-1],Sub[-1],Del[-1],Ins[-1], len(mandwords)
-
-def charalign(ocrd,mand):
+            if left[0]+1 < cell[0]:
+                cell = (left[0]+1, left[1], left[2], left[3]+1, left[4])
+
+            row.append(cell)
+            left = cell
+        prev = row
+
+    tot, noo, sub, ins, dele = prev[-1]
+    return tot, noo, sub, dele, ins
+
+# The operations/backpointers of a cell of the matrix are stored as bit
+# flags, one byte per cell: the bit of every operation that gives the
+# best score of the cell is set (there may be several). When there are
+# several, the traceback picks, in this order,
+#
+#   OP_DEL (d, r, -)  before  OP_INS (i)  before  OP_SUB (n, w, h, t)
+#
+# which is the order in which ties are added to the cell. OP_Z marks the
+# alternative startpoints on the top margin, see z in charalign.
+OP_SUB = 1
+OP_INS = 2
+OP_DEL = 4
+OP_Z = 8
+
+def charalign(ocrd,mand,band=None,engine='python',max_cost=None,options=None,compact=False):
     # Align an ocr string and a manual (gold standard) string
+    #
+    # With band (an int), only a band around the diagonal of the matrix
+    # is filled in, see _charalign_banded. engine='numpy' fills in the
+    # matrix with numpy instead, see _charalign_numpy. All give the same
+    # alignment. engine='linear' aligns in memory linear in the length
+    # of the strings, for long pages, see _charalign_linear.
+    # engine='anchored' only aligns the parts between long exact matches,
+    # see _charalign_anchored.
+    #
+    # With max_cost, only alignments with a score of at most max_cost
+    # are looked for, and None is returned if there is none, see
+    # _charalign_bounded.
+    #
+    # options are the AlignOptions of the alignment, by default those of
+    # the OPT globals. With a list of AlignOptions, a list with an
+    # alignment for each is returned. As the options only change where
+    # the traceback starts and ends, the full matrix (engine 'python'
+    # without band or max_cost, or 'numpy') is then filled in once for
+    # all of them; the other ways of aligning are run once per options.
+    #
+    # The alignments are ocrdrec, mandrec: two lists with a character per
+    # column, '' for a gap. With compact, they are Alignment objects.
+
+    def result(alignment):
+        if alignment is None:
+            return None
+        ocrdrec, mandrec, start = alignment
+        if compact:
+            return Alignment.from_lists(ocrdrec, mandrec, ocrd, mand, start)
+        return ocrdrec, mandrec
+
+    alignments = _charalign(ocrd,mand,band,engine,max_cost,options)
+    if isinstance(options, list):
+        return [result(a) for a in alignments]
+    return result(alignments)
+
+def _charalign(ocrd,mand,band,engine,max_cost,options):
+    # charalign, with the alignments as ocrdrec, mandrec and where they
+    # start in ocrd: the column the traceback stopped at, see _backtrack
+    # (their start in mand is always 0)
+
+    if isinstance(options, list):
+        options = [_options(o) for o in options]
+        if max_cost is not None or band is not None or engine not in ('python','numpy'):
+            return [_charalign(ocrd,mand,band,engine,max_cost,o) for o in options]
+    else:
+        options = _options(options)
+
+    if max_cost is not None:
+        if band is not None or engine != 'python':
+            raise ValueError('max_cost is only supported by the python engine without band')
+        return _charalign_bounded(ocrd,mand,max_cost,options)
+    if engine in ('numpy','linear','anchored'):
+        if band is not None:
+            raise ValueError('band is not supported by the %s engine' % engine)
+        if engine == 'linear':
+            return _charalign_linear(ocrd,mand,options)
+        if engine == 'anchored':
+            return _charalign_anchored(ocrd,mand,options)[:3]
+        return _charalign_numpy(ocrd,mand,options)
+    elif engine != 'python':
+        raise ValueError('unknown engine %r' % engine)
+    if band is not None:
+        return _charalign_banded(ocrd,mand,band,options)
 
     # First fill in the edit distance matrix
     # Operations, each may be associated with special costs/circumstances
@@ -142,26 +323,29 @@ def charalign(ocrd,mand):
     # t: substitute
     # -: delete a hyphen at the end of the line
     # r: deleta a return
+    #
+    # The letters are kept apart in the comments only, the matrix holds
+    # the OP_ flags of the operations (see above).
 
     x = len(ocrd)+1
     y = len(mand)+1
     M = [0 for _ in range(x*y)]         # matrix (as list) holding scores
-    O = ['' for _ in range(x*y)]        # matrix (as list) holding operations/backpointers
+    O = bytearray(x*y)                  # matrix (as bytes) holding operations/backpointers
 
     M[0] = 0
     for i in range(1,x):
         # fill in the X-margin, mark positions after a newline
         if i > 1 and ocrd[i-1]=='\n':
             M[i] = 0
-            O[i] = 'z'
+            O[i] = OP_Z
         else:
             M[i] = M[i-1]+1
-            O[i] = 'd'
+            O[i] = OP_DEL
 
     for j in range(1,y):
         # fill in the Y-margin
         M[x*j] = M[x*(j-1)] + 1
-        O[x*j] = 'i'
+        O[x*j] = OP_INS
 
     for j in range(1,y):
         for i in range(1,x):
@@ -173,13 +357,13 @@ def charalign(ocrd,mand):
             ocrdchar = ocrd[i-1]
             if mandchar == ocrdchar:
                 diag = M[(i-1)+x*(j-1)]
-                ops = 'n' # no-op
+                ops = OP_SUB # n: no-op
             elif mandchar in ' \t\n' and ocrdchar in ' \t\n':
                 diag = M[(i-1)+x*(j-1)]
-                ops = 'w' # match whitespace
+                ops = OP_SUB # w: match whitespace
             elif mandchar in '-\u2014\u00ad' and ocrdchar in '-\u2014\xad':
                 diag = M[(i-1)+x*(j-1)]
-                ops = 'h' # match hyphens
+                ops = OP_SUB # h: match hyphens
             elif mandchar not in '\t \n' and ocrdchar not in ' \t\n':
                 if mandchar in punct and ocrdchar in punct:
                     diag = M[(i-1)+x*(j-1)]+0.999 # if it's all the same, prefer to substitute punktuation for punktuation
@@ -187,36 +371,36 @@ def charalign(ocrd,mand):
                     diag = M[(i-1)+x*(j-1)]+0.999 #                       or substitute nonpunktuation for nonpunktuation
                 else:
                     diag = M[(i-1)+x*(j-1)]+1
-                ops = 't' # substitute, only non-whitespace
+                ops = OP_SUB # t: substitute, only non-whitespace
             else:
-                ops = 'x'
+                ops = OP_SUB
                 diag = M[(i-1)+x*(j-1)]+100000
             bst = diag
 
             # inserts
             down = M[i+x*(j-1)]+1
             if down < bst:
-                ops = 'i' # insert
+                ops = OP_INS # i: insert
                 bst = down
             elif down == bst:
-                ops += 'i'
+                ops |= OP_INS
 
             # deletes
             if ocrd[i-1] in ('-','\xad') and (i==x-1 or (i < x-1 and ocrd[i]=='\n')):
                 rght = M[(i-1)+x*j]
-                dops = '-' # delete a hyphen at the end of the line = free
+                dops = OP_DEL # -: delete a hyphen at the end of the line = free
             elif ocrd[i-1] == '\n':
                 rght = M[(i-1)+x*j]
-                dops = 'r' # delete a newline ('r'eturn) = free
+                dops = OP_DEL # r: delete a newline ('r'eturn) = free
             else:
                 rght = M[(i-1)+x*j]+1
-                dops = 'd' # delete
+                dops = OP_DEL # d: delete
 
             if rght < bst:
                 ops = dops
                 bst = rght
             elif rght == bst:
-                ops += dops
+                ops |= dops
 
             # enter the best score and operations/backpointers in the matrices
             M[i+x*j] = bst
@@ -224,50 +408,776 @@ def charalign(ocrd,mand):
 
 
 
+    return _tracebacks(ocrd, mand, lambda i,j: O[i+x*j], lambda i: M[i+x*(y-1)], options)
+
+
+def _tracebacks(ocrd, mand, op_at, endscore, options):
+    # _traceback for the options, or for each of a list of options
+    if isinstance(options, list):
+        return [_traceback(ocrd, mand, op_at, endscore, o) for o in options]
+    return _traceback(ocrd, mand, op_at, endscore, options)
+
+def _traceback(ocrd, mand, op_at, endscore, options):
     # Reconstruct one of the optimal alignments. There is no explicit
     # control over which alignment is chosen in case of multiple
     # alignments with the same, optimatal score.
+    #
+    # op_at(i,j) gives the operations (OP_ flags) of cell i,j and endscore(i)
+    # the score of cell i on the bottom row, so that the different
+    # ways of filling in the matrix can share the traceback.
+    #
+    # Returns ocrdrec, mandrec and where the alignment starts in ocrd.
 
-    # Alignment endpoint logic, depends on -se switch (=OPTstripend)
-    j = y-1
-    if OPTstripend and '\n' in ocrd:
+    with _stage('traceback'):
+        i = _endpoint(ocrd, endscore, options.stripend)
+        j = len(mand)
+        ocrdrec, mandrec, start = _backtrack(ocrd, mand, op_at, i, j, stripbeg=options.stripbeg)
+
+#    for p in zip(reversed(mandrec),reversed(ocrdrec)):
+#        print "[%s]\t[%s]" % p
+
+    return list(reversed(ocrdrec)),list(reversed(mandrec)),start
+
+
+def _endpoint(ocrd, endscore, stripend):
+    # Alignment endpoint logic, depends on -se switch (=stripend): the
+    # cell of the bottom row the alignment ends in
+    x = len(ocrd)+1
+    if stripend and '\n' in ocrd:
         # endpoint is cheapest cell on bottom row that corresponds to a newline in the ocr string
-        i = -min((M[(i+1)+x*j],-(i+1)) for i,ch in enumerate(ocrd) if ch=='\n' or i==x-2)[1]
-    else:
-        i = x-1
+        return -min((endscore(i+1),-(i+1)) for i,ch in enumerate(ocrd) if ch=='\n' or i==x-2)[1]
+    return x-1
+
+def _backtrack(ocrd, mand, op_at, i, j, i0=0, j0=0, stripbeg=False):
+    # Follow the operations from cell i,j back to cell i0,j0 (or to a
+    # z when stripping the beginning), collecting the alignment in
+    # reverse order. Returns it and the column i of the cell it stopped
+    # at, where the alignment starts in ocrd.
 
     ocrdrec = []
     mandrec = []
 
-    while i or j:
-        op = O[i+x*j][-1]
-        if OPTstripbeg and op == 'z': # ztartpoint of the alignment, see also endpoint logic
-                                      # depends on -sb switch (=OPTstripbeg)
-            break
-        elif op in 'ntwh':
-            ocrdrec.append(ocrd[i-1])
-            mandrec.append(mand[j-1])
-            i -= 1
-            j -= 1
-        elif op in 'dz': # case for z when stripping of initial lines is not allowed
+    while i > i0 or j > j0:
+        op = op_at(i,j)
+        if op & OP_Z:
+            if stripbeg: # ztartpoint of the alignment, see also endpoint logic
+                         # depends on -sb switch (=stripbeg)
+                break
+            # case for z when stripping of initial lines is not allowed
             ocrdrec.append(ocrd[i-1])
             mandrec.append('') # u'\u03F5')
             i -= 1
-        elif op=='e':
-            i -= 1
-        elif op in 'r-':
+        elif op & OP_DEL: # d, or the free r and -
             ocrdrec.append(ocrd[i-1])
-            mandrec.append('') # %
+            mandrec.append('') # u'\u03F5')
             i -= 1
-        elif op == 'i':
+        elif op & OP_INS:
             ocrdrec.append('') # u'\u03F5')
             mandrec.append(mand[j-1])
             j -= 1
+        elif op & OP_SUB: # n, t, w, h
+            ocrdrec.append(ocrd[i-1])
+            mandrec.append(mand[j-1])
+            i -= 1
+            j -= 1
 
-#    for p in zip(reversed(mandrec),reversed(ocrdrec)):
-#        print "[%s]\t[%s]" % p
+    return ocrdrec, mandrec, i
+
+
+def _substitution(ocrdchar,mandchar):
+    # Cost for aligning ocrdchar with mandchar (an OP_SUB), the same
+    # cases as in the matrix filling of charalign
+    if mandchar == ocrdchar:
+        return 0
+    elif mandchar in ' \t\n' and ocrdchar in ' \t\n':
+        return 0
+    elif mandchar in '-\u2014\u00ad' and ocrdchar in '-\u2014\xad':
+        return 0
+    elif mandchar not in '\t \n' and ocrdchar not in ' \t\n':
+        if (mandchar in punct) == (ocrdchar in punct):
+            return 0.999
+        return 1
+    else:
+        return 100000
 
-    return list(reversed(ocrdrec)),list(reversed(mandrec))
+def _substitution_table(ocrd,mand):
+    # table[mandchar][ocrdchar] = cost, for all character pairs in the strings
+    ocrdchars = set(ocrd)
+    return {m: {o: _substitution(o,m) for o in ocrdchars} for m in set(mand)}
+
+def _deletions(ocrd):
+    # Cost for deleting the ocr character at matrix index i (= string
+    # index i-1), newlines and line-final hyphens are free
+    x = len(ocrd)+1
+    dels = [1]
+    for i in range(1,x):
+        if ocrd[i-1] in ('-','\xad') and (i==x-1 or ocrd[i]=='\n'):
+            dels.append(0)
+        elif ocrd[i-1] == '\n':
+            dels.append(0)
+        else:
+            dels.append(1)
+    return dels
+
+def _top_margin(ocrd,hi):
+    # Cells 0..hi of the top row (the X-margin) of the matrix, as in charalign
+    Mrow = [0]
+    Orow = bytearray(1)
+    for i in range(1,hi+1):
+        if i > 1 and ocrd[i-1]=='\n':
+            Mrow.append(0)
+            Orow.append(OP_Z)
+        else:
+            Mrow.append(Mrow[-1]+1)
+            Orow.append(OP_DEL)
+    return Mrow, Orow
+
+def _fill_row(ocrd,costs,dels,prev,plo,phi,lo,hi,margin):
+    # Fill in cells lo..hi of a row of the matrix, as in charalign, from
+    # the row above, which holds cells plo..phi (plo <= lo). Cells
+    # outside of these ranges count as unreachable. If margin, cell lo
+    # is on the left margin, i.e. can only be reached from above. costs
+    # are the substitutions for the manual character of the row, see
+    # _substitution_table.
+
+    inf = float('inf')
+    Mrow = []
+    Orow = bytearray()
+    if margin:
+        Mrow.append(prev[lo-plo]+1)
+        Orow.append(OP_INS)
+        lo += 1
+
+    for i in range(lo,hi+1):
+        # substitutions
+        if plo < i <= phi+1:
+            bst = prev[i-1-plo]+costs[ocrd[i-1]]
+            ops = OP_SUB
+        else:
+            bst = inf
+            ops = 0
+
+        # inserts
+        if i <= phi:
+            down = prev[i-plo]+1
+            if down < bst:
+                ops = OP_INS
+                bst = down
+            elif down == bst:
+                ops |= OP_INS
+
+        # deletes
+        if Mrow:
+            rght = Mrow[-1]+dels[i]
+            if rght < bst:
+                ops = OP_DEL
+                bst = rght
+            elif rght == bst:
+                ops |= OP_DEL
+
+        Mrow.append(bst)
+        Orow.append(ops)
+    return Mrow, Orow
+
+def _charalign_banded(ocrd,mand,band,options):
+    # Same alignment as charalign, found in two steps. First only the
+    # cells within band positions of the diagonal (from the top left to
+    # the bottom right corner) are filled in, everything outside the
+    # band counts as unreachable; if the resulting alignment touches the
+    # edge of the band, the band is doubled and the alignment redone.
+    #
+    # That alignment need not be the best one: a better alignment may
+    # run entirely outside of the band, e.g. one that starts at a z far
+    # into the ocr string (see charalign), after lines of junk at the top
+    # of the ocr. Its score is an upper bound of the best score though,
+    # so the alignment is then redone with that score as max_cost, see
+    # _charalign_bounded, which is exact. For ocr output that is close to
+    # the gold standard both steps fill in about (len(ocrd)+len(mand))*band
+    # cells instead of len(ocrd)*len(mand).
+
+    x = len(ocrd)+1
+    y = len(mand)+1
+    inf = float('inf')
+    slope = (x-1)/(y-1) if y > 1 else x-1
+    band = max(band, math.ceil(slope)+1) # the band must be connected from row to row
+    table = _substitution_table(ocrd,mand)
+    dels = _deletions(ocrd)
+
+    while True:
+        lo = [max(0,round(j*slope)-band) for j in range(y)]
+        hi = [min(x-1,round(j*slope)+band) for j in range(y)]
+        M = []  # rows of scores, M[j][i-lo[j]] holds the score of cell i,j
+        O = []  # rows of operations/backpointers, indexed as M
+
+        Mrow, Orow = _top_margin(ocrd,hi[0])
+        M.append(Mrow)
+        O.append(Orow)
+
+        for j in range(1,y):
+            Mrow, Orow = _fill_row(ocrd,table[mand[j-1]],dels,M[j-1],lo[j-1],hi[j-1],lo[j],hi[j],lo[j]==0)
+            M.append(Mrow)
+            O.append(Orow)
+
+        touched = False
+        def op_at(i,j):
+            nonlocal touched
+            if (i == lo[j] and i > 0) or (i == hi[j] and i < x-1):
+                touched = True
+            return O[j][i-lo[j]]
+
+        def endscore(i):
+            if lo[y-1] <= i <= hi[y-1]:
+                return M[y-1][i-lo[y-1]]
+            return inf
+
+        alignment = _traceback(ocrd, mand, op_at, endscore, options)
+        everything = all(l == 0 for l in lo) and all(h == x-1 for h in hi)
+        if everything:
+            # the band is the whole matrix
+            return alignment
+        if not touched and min(endscore(i) for i in range(x)) < inf:
+            break
+        band *= 2
+
+    # the margin covers the rounding of the scores (sums of 0.999s)
+    # along other paths than the one of the band
+    score = endscore(_endpoint(ocrd, endscore, options.stripend))
+    return _charalign_bounded(ocrd,mand,score+1e-6,options)
+
+
+def _charalign_bounded(ocrd,mand,max_cost,options):
+    # Same alignment as charalign if its score is at most max_cost, else
+    # None. As the scores only grow along a path through the matrix,
+    # cells scoring more than max_cost can't be on such an alignment,
+    # nor can cells from where more manual than ocr characters are left,
+    # if their score plus an insert for each of the extra manual
+    # characters is more than max_cost. Likewise, unless the end may be
+    # stripped, for cells from where more ocr than manual characters are
+    # left, with a delete for each extra ocr character but as many
+    # of the free ones (newlines, hyphens) as are left. Each row is filled in only
+    # between the first and the last cell of the row above that may be
+    # on such an alignment (and as far to the right as deletes keep it
+    # so), and as soon as no cell of a row may be, the alignment is
+    # given up. For ocr that has little to do with the manual string
+    # this fills in about len(ocrd)*max_cost cells instead of
+    # len(ocrd)*len(mand).
+
+    x = len(ocrd)+1
+    y = len(mand)+1
+    inf = float('inf')
+    table = _substitution_table(ocrd,mand)
+    dels = _deletions(ocrd)
+    lo = []  # the cells lo[j]..lo[j]+len(M[j])-1 of row j are filled in
+    M = []
+    O = []
+
+    # free[i] is the number of free deletes after cell i of a row, or
+    # with stripend, where the rest of the ocr may be stripped, as many
+    # as there are characters
+    free = [0]*x
+    for i in range(x-2,-1,-1):
+        free[i] = free[i+1] + (1 if options.stripend or dels[i+1] == 0 else 0)
+
+    def within(v,i,j):
+        # may cell i,j with score v be on an alignment within max_cost
+        return v + max(0,(y-1-j)-(x-1-i),(x-1-i)-(y-1-j)-free[i]) <= max_cost
+
+    def keep(Mrow,Orow,rowlo,j):
+        # cut off the cells beyond max_cost at both ends of row j
+        first = next((k for k,v in enumerate(Mrow) if within(v,rowlo+k,j)), None)
+        if first is None:
+            return False
+        if j == 0:
+            # the top margin is kept from the start: without stripbeg the
+            # traceback runs along it to the start, see _backtrack
+            first = 0
+        last = len(Mrow)-1
+        while not within(Mrow[last],rowlo+last,j):
+            last -= 1
+        lo.append(rowlo+first)
+        M.append(Mrow[first:last+1])
+        O.append(Orow[first:last+1])
+        return True
+
+    if not keep(*_top_margin(ocrd,x-1),0,0):
+        return None
+    for j in range(1,y):
+        plo = lo[j-1]
+        phi = plo+len(M[j-1])-1
+        Mrow, Orow = _fill_row(ocrd,table[mand[j-1]],dels,M[j-1],plo,phi,plo,min(phi+1,x-1),plo==0)
+        i = plo+len(Mrow)
+        while i < x and within(Mrow[-1]+dels[i],i,j):
+            Mrow.append(Mrow[-1]+dels[i])
+            Orow.append(OP_DEL)
+            i += 1
+        if not keep(Mrow,Orow,plo,j):
+            return None
+
+    def endscore(i):
+        if lo[y-1] <= i < lo[y-1]+len(M[y-1]):
+            return M[y-1][i-lo[y-1]]
+        return inf
+
+    if endscore(_endpoint(ocrd, endscore, options.stripend)) > max_cost:
+        return None
+    return _traceback(ocrd, mand, lambda i,j: O[j][i-lo[j]], endscore, options)
+
+# Blocks of at most this many cells are aligned with a full matrix by _charalign_linear
+LINEAR_BLOCK = 1<<16
+
+def _charalign_linear(ocrd,mand,options):
+    # Same alignment score as charalign, with memory use linear in the
+    # length of the strings (Hirschberg's divide and conquer): the scores
+    # of the middle row of the matrix are computed forwards from the
+    # start and backwards from the end, one row at a time, and the cell
+    # with the lowest sum is a point on an optimal alignment. The
+    # alignment is then split there and the two halves aligned the same
+    # way, down to blocks small enough for a full matrix.
+    #
+    # NB! If there are several optimal alignments, another one than the
+    # one of charalign may be chosen.
+
+    x = len(ocrd)+1
+    y = len(mand)+1
+    table = _substitution_table(ocrd,mand)
+    dels = _deletions(ocrd)
+
+    # Alignment endpoint logic, as in _traceback
+    if options.stripend and '\n' in ocrd:
+        bottom = _forward_row(ocrd,mand,0,x-1,0,y-1,table,dels)
+        i = _endpoint(ocrd, bottom.__getitem__, True)
+    else:
+        i = x-1
+
+    ocrdrec = []
+    mandrec = []
+    start = _align_linear(ocrd,mand,0,i,0,y-1,table,dels,ocrdrec,mandrec,options.stripbeg)
+    return ocrdrec, mandrec, start
+
+def _align_linear(ocrd,mand,i0,i1,j0,j1,table,dels,ocrdrec,mandrec,stripbeg):
+    # Append an optimal alignment from cell i0,j0 to cell i1,j1 to
+    # ocrdrec and mandrec (starting at a z, if stripbeg, see _backtrack).
+    # Returns the column it starts at.
+    if j1-j0 <= 1 or (i1-i0+1)*(j1-j0+1) <= LINEAR_BLOCK:
+        O = [Orow for _,Orow in _block_rows(ocrd,mand,i0,i1,j0,j1,table,dels)]
+        o, m, start = _backtrack(ocrd, mand, lambda i,j: O[j-j0][i-i0], i1, j1, i0, j0, stripbeg)
+        ocrdrec.extend(reversed(o))
+        mandrec.extend(reversed(m))
+        return start
+
+    mid = (j0+j1)//2
+    forward = _forward_row(ocrd,mand,i0,i1,j0,mid,table,dels)
+    backward = _backward_row(ocrd,mand,i0,i1,mid,j1,table,dels)
+    c = i0+min(range(i1-i0+1), key=lambda k: forward[k]+backward[k])
+    del forward, backward
+
+    start = _align_linear(ocrd,mand,i0,c,j0,mid,table,dels,ocrdrec,mandrec,stripbeg)
+    _align_linear(ocrd,mand,c,i1,mid,j1,table,dels,ocrdrec,mandrec,stripbeg)
+    return start
+
+def _block_rows(ocrd,mand,i0,i1,j0,j1,table,dels):
+    # Generate the rows j0..j1 (scores and operations, cells i0..i1) of
+    # the matrix for alignments that start at cell i0,j0. On the top row
+    # (j0 = 0, and then i0 = 0) that is the top margin of charalign.
+    if j0 == 0:
+        Mrow, Orow = _top_margin(ocrd,i1)
+    else:
+        Mrow = [0]
+        Orow = bytearray(1)
+        for i in range(i0+1,i1+1):
+            Mrow.append(Mrow[-1]+dels[i])
+            Orow.append(OP_DEL)
+    yield Mrow, Orow
+
+    for j in range(j0+1,j1+1):
+        Mrow, Orow = _fill_row(ocrd,table[mand[j-1]],dels,Mrow,i0,i1,i0,i1,True)
+        yield Mrow, Orow
+
+def _forward_row(ocrd,mand,i0,i1,j0,j1,table,dels):
+    # Scores of cells i0..i1 on row j1, for alignments that start at cell i0,j0
+    for Mrow, _ in _block_rows(ocrd,mand,i0,i1,j0,j1,table,dels):
+        pass
+    return Mrow
+
+def _backward_row(ocrd,mand,i0,i1,j0,j1,table,dels):
+    # Scores of the cheapest ways from cells i0..i1 on row j0 to cell
+    # i1,j1, i.e. the matrix of charalign filled in backwards
+    w = i1-i0
+    B = [0 for _ in range(w+1)]
+    for i in range(i1-1,i0-1,-1):
+        B[i-i0] = B[i+1-i0]+dels[i+1]
+
+    for j in range(j1-1,j0-1,-1):
+        costs = table[mand[j]]
+        below = B
+        B = [0 for _ in range(w+1)]
+        B[w] = below[w]+1
+        for i in range(i1-1,i0-1,-1):
+            k = i-i0
+            bst = below[k+1]+costs[ocrd[i]] # substitution
+            down = below[k]+1                  # insert
+            if down < bst:
+                bst = down
+            rght = B[k+1]+dels[i+1]            # delete
+            if rght < bst:
+                bst = rght
+            B[k] = bst
+    return B
+
+
+# Length of the n-grams that _charalign_anchored anchors alignments on
+ANCHOR_LENGTH = 12
+
+def _charalign_anchored(ocrd,mand,options,n=ANCHOR_LENGTH,withcost=False):
+    # Align the ocr and manual strings piecewise: long exact matches
+    # between them (see _anchors) are taken as given, and only the gaps
+    # between them are aligned, with _align_linear. For ocr of the same
+    # text as the manual string most of the page is anchored, so the
+    # cost is close to linear instead of len(ocrd)*len(mand). The
+    # anchors may force an alignment that is worse than the optimal
+    # one, see main(anchorcheck=True).
+    #
+    # Returns ocrdrec, mandrec, where the alignment starts in ocrd and,
+    # if withcost, its score (else None).
+
+    x = len(ocrd)+1
+    y = len(mand)+1
+    table = _substitution_table(ocrd,mand)
+    dels = _deletions(ocrd)
+
+    ocrdrec = []
+    mandrec = []
+    cost = 0
+    i0 = j0 = 0
+    start = None # only the first gap may start later than its cell 0,0
+    for i, j, length in _anchors(ocrd,mand,n):
+        if withcost:
+            cost += _forward_row(ocrd,mand,i0,i,j0,j,table,dels)[-1]
+        gap = _align_linear(ocrd,mand,i0,i,j0,j,table,dels,ocrdrec,mandrec,options.stripbeg)
+        if start is None:
+            start = gap
+        ocrdrec.extend(ocrd[i:i+length])
+        mandrec.extend(mand[j:j+length])
+        i0 = i+length
+        j0 = j+length
+
+    # the last gap, with the endpoint logic of _traceback
+    if options.stripend and '\n' in ocrd or withcost:
+        bottom = _forward_row(ocrd,mand,i0,x-1,j0,y-1,table,dels)
+    if options.stripend and '\n' in ocrd:
+        i = _endpoint(ocrd, lambda i: bottom[i-i0] if i >= i0 else float('inf'), True)
+    else:
+        i = x-1
+    if withcost:
+        cost += bottom[i-i0]
+    gap = _align_linear(ocrd,mand,i0,i,j0,y-1,table,dels,ocrdrec,mandrec,options.stripbeg)
+    if start is None:
+        start = gap
+
+    return ocrdrec, mandrec, start, cost if withcost else None
+
+def _anchors(ocrd,mand,n):
+    # Exact matches to anchor an alignment on, as (i, j, length) where i
+    # and j are indices in ocrd and mand, in the same order in both
+    # strings and not overlapping. The n-grams that occur exactly once in
+    # each string are matched up, the longest chain of them that is in
+    # order in both strings is kept (as in patience diff), and the
+    # matches are merged and extended as far as the strings agree.
+
+    def unique_grams(s):
+        grams = {}
+        for k in range(len(s)-n+1):
+            g = s[k:k+n]
+            grams[g] = -1 if g in grams else k
+        return grams
+
+    mandgrams = unique_grams(mand)
+    pairs = sorted((i, mandgrams[g]) for g,i in unique_grams(ocrd).items() if i >= 0 and mandgrams.get(g,-1) >= 0)
+
+    # longest chain with increasing j (the i's are increasing already)
+    tails = []   # tails[k]: the pair ending the best chain of length k+1 found so far
+    tailjs = []  # ...and its j
+    back = []    # back[p]: the pair before pair p in its chain
+    for p, (i, j) in enumerate(pairs):
+        k = bisect.bisect_left(tailjs,j)
+        back.append(tails[k-1] if k else -1)
+        if k == len(tails):
+            tails.append(p)
+            tailjs.append(j)
+        else:
+            tails[k] = p
+            tailjs[k] = j
+    chain = []
+    p = tails[-1] if tails else -1
+    while p >= 0:
+        chain.append(pairs[p])
+        p = back[p]
+    chain.reverse()
+
+    # merge matches on the same diagonal, cut overlapping ones
+    anchors = []
+    for i, j in chain:
+        length = n
+        if anchors:
+            ai, aj, alength = anchors[-1]
+            if i-ai == j-aj and i <= ai+alength:
+                anchors[-1] = (ai, aj, max(alength,i+n-ai))
+                continue
+            overlap = max(ai+alength-i, aj+alength-j, 0)
+            if overlap >= n:
+                continue
+            i += overlap
+            j += overlap
+            length -= overlap
+        anchors.append((i, j, length))
+
+    # extend the matches as far as the strings agree
+    extended = []
+    for k, (i, j, length) in enumerate(anchors):
+        pi, pj = (extended[-1][0]+extended[-1][2], extended[-1][1]+extended[-1][2]) if extended else (0, 0)
+        ni, nj = anchors[k+1][:2] if k+1 < len(anchors) else (len(ocrd), len(mand))
+        while i > pi and j > pj and ocrd[i-1] == mand[j-1]:
+            i -= 1
+            j -= 1
+            length += 1
+        while i+length < ni and j+length < nj and ocrd[i+length] == mand[j+length]:
+            length += 1
+        extended.append((i, j, length))
+    return extended
+
+def alignment_score(ocrd,mand,options=None):
+    # The score of an optimal alignment of the strings (the one charalign
+    # picks an alignment for), in memory linear in the length of the
+    # strings
+    x = len(ocrd)+1
+    y = len(mand)+1
+    bottom = _forward_row(ocrd,mand,0,x-1,0,y-1,_substitution_table(ocrd,mand),_deletions(ocrd))
+    return bottom[_endpoint(ocrd, bottom.__getitem__, _options(options).stripend)]
+
+
+def _charalign_numpy(ocrd,mand,options):
+    # Same alignment as charalign, with the matrix filled in by numpy.
+    # Both strings are turned into arrays of indices into their
+    # alphabets, so that the substitution costs can be looked up in a
+    # precomputed table, and the matrix is filled in one
+    # anti-diagonal (i+j = d) at a time: all cells on an anti-diagonal
+    # only depend on the two previous ones, so each anti-diagonal is a
+    # handful of vectorized operations. Only the last three
+    # anti-diagonals of scores are kept, plus the bottom row which the
+    # endpoint logic needs. The operations are kept for the whole matrix
+    # as one byte of OP_ flags per cell.
+
+    x = len(ocrd)+1
+    y = len(mand)+1
+
+    ocrdchars, ocrdidx = np.unique(np.array([ord(c) for c in ocrd],dtype=np.int64),return_inverse=True)
+    mandchars, mandidx = np.unique(np.array([ord(c) for c in mand],dtype=np.int64),return_inverse=True)
+    subcost = np.empty((len(mandchars),len(ocrdchars)))
+    for mi,m in enumerate(mandchars):
+        for oi,o in enumerate(ocrdchars):
+            subcost[mi,oi] = _substitution(chr(o),chr(m))
+    delcost = np.array(_deletions(ocrd),dtype=np.float64)
+
+    # the margins, as in charalign
+    top = [0]
+    O = np.zeros((y,x),dtype=np.uint8)
+    for i in range(1,x):
+        if i > 1 and ocrd[i-1]=='\n':
+            top.append(0)
+            O[0,i] = OP_Z
+        else:
+            top.append(top[-1]+1)
+            O[0,i] = OP_DEL
+    O[1:,0] = OP_INS
+
+    bottom = np.array(top,dtype=np.float64) if y == 1 else np.empty(x)
+    if y > 1:
+        bottom[0] = y-1
+
+    # M2, M1 and M0 hold the anti-diagonals d-2, d-1 and d, indexed by i
+    M2 = np.zeros(x)
+    M1 = np.zeros(x)
+    M0 = np.zeros(x)
+    for d in range(1,x+y-1):
+        if d < x:
+            M0[d] = top[d]
+        if d < y:
+            M0[0] = d
+        ilo = max(1,d-(y-1))
+        ihi = min(x-1,d-1)
+        if ilo <= ihi:
+            I = np.arange(ilo,ihi+1)
+            J = d-I
+            mi = mandidx[J-1]
+            oi = ocrdidx[I-1]
+
+            # substitutions
+            diag = M2[ilo-1:ihi]+subcost[mi,oi]
+
+            # inserts
+            down = M1[ilo:ihi+1]+1
+            ops = np.where(down < diag,OP_INS,np.where(down == diag,OP_SUB|OP_INS,OP_SUB))
+            bst = np.minimum(diag,down)
+
+            # deletes
+            rght = M1[ilo-1:ihi]+delcost[ilo:ihi+1]
+            ops = np.where(rght < bst,OP_DEL,np.where(rght == bst,ops|OP_DEL,ops))
+            M0[ilo:ihi+1] = np.minimum(bst,rght)
+            O[J,I] = ops
+            if ilo == d-(y-1):
+                bottom[ilo] = M0[ilo]
+        M2, M1, M0 = M1, M0, M2
+
+    return _tracebacks(ocrd, mand, lambda i,j: O[j,i], lambda i: bottom[i], options)
+
+
+class Alignment:
+    # An alignment of the ocr string ocrd with the manual string mand in
+    # compact form, instead of ocrdrec and mandrec, the two lists of a
+    # character (or '' for a gap) per column: ops holds the operation of
+    # each column as a byte, OP_SUB for an ocr and a manual character,
+    # OP_DEL for only an ocr character and OP_INS for only a manual
+    # character, and ocrd_index and mand_index the positions of the
+    # characters of each column in ocrd and mand (-1 for a gap).
+    #
+    # charalign(compact=True) returns alignments in this form, and
+    # score_and_print, worderrors and worderrors_from_alignment take
+    # either form, see _alignment. from_lists and to_lists convert
+    # between them.
+
+    def __init__(self, ocrd, mand, ops, ocrd_start=0, mand_start=0):
+        self.ocrd = ocrd
+        self.mand = mand
+        self.ops = np.asarray(ops, dtype=np.uint8)
+        self.ocrd_start = ocrd_start
+        self.mand_start = mand_start
+        has_ocrd = self.ops != OP_INS
+        has_mand = self.ops != OP_DEL
+        # _ocrd_next[k] is the position in ocrd of the first ocr character
+        # of columns k.., so that columns k1..k2-1 hold ocrd[_ocrd_next[k1]:_ocrd_next[k2]]
+        self._ocrd_next = _next(has_ocrd, ocrd_start)
+        self._mand_next = _next(has_mand, mand_start)
+        self.ocrd_index = np.where(has_ocrd, self._ocrd_next[:-1], -1)
+        self.mand_index = np.where(has_mand, self._mand_next[:-1], -1)
+
+    @classmethod
+    def from_lists(cls, ocrdrec, mandrec, ocrd=None, mand=None, ocrd_start=None, mand_start=None):
+        # From ocrdrec, mandrec, of the strings ocrd and mand (by default
+        # the characters of the alignment only), starting at ocrd_start
+        # and mand_start in them. Without those, the first place where
+        # the characters of the alignment occur is taken, which with -sb
+        # and -se need not be where the alignment is: charalign(compact=True)
+        # passes the start of the traceback.
+        ocrdpart = ''.join(ocrdrec)
+        mandpart = ''.join(mandrec)
+        has_ocrd = np.fromiter(map(bool, ocrdrec), dtype=bool, count=len(ocrdrec))
+        has_mand = np.fromiter(map(bool, mandrec), dtype=bool, count=len(mandrec))
+        ops = np.where(has_ocrd, np.where(has_mand, OP_SUB, OP_DEL), OP_INS)
+        if ocrd is None:
+            ocrd = ocrdpart
+        if mand is None:
+            mand = mandpart
+        if ocrd_start is None:
+            ocrd_start = ocrd.find(ocrdpart)
+        if mand_start is None:
+            mand_start = mand.find(mandpart)
+        return cls(ocrd, mand, ops, ocrd_start, mand_start)
+
+    def to_lists(self):
+        # ocrdrec, mandrec
+        return self.ocrd_chars(), self.mand_chars()
+
+    def __len__(self):
+        return len(self.ops)
+
+    def ocrd_chars(self, columns=slice(None)):
+        # The ocr characters of the columns ('' for gaps), as a list
+        return [self.ocrd[i] if i >= 0 else '' for i in self.ocrd_index[columns].tolist()]
+
+    def mand_chars(self, columns=slice(None)):
+        return [self.mand[j] if j >= 0 else '' for j in self.mand_index[columns].tolist()]
+
+    def ocrd_text(self, start=0, end=None):
+        # The ocr characters of columns start..end-1, as a string
+        end = len(self.ops) if end is None else end
+        return self.ocrd[self._ocrd_next[start]:self._ocrd_next[end]]
+
+    def mand_text(self, start=0, end=None):
+        end = len(self.ops) if end is None else end
+        return self.mand[self._mand_next[start]:self._mand_next[end]]
+
+    def ocrd_codes(self):
+        # The code point of the ocr character of each column, -1 for gaps
+        return _codes(self.ocrd)[self.ocrd_index]
+
+    def mand_codes(self):
+        return _codes(self.mand)[self.mand_index]
+
+    def ocrd_gaps(self):
+        # The columns without an ocr character
+        return np.flatnonzero(self.ops == OP_INS)
+
+    def mand_gaps(self):
+        # The columns without a manual character
+        return np.flatnonzero(self.ops == OP_DEL)
+
+    def is_gap(self, k):
+        # (ocr gap, manual gap) of column k
+        return bool(self.ops[k] == OP_INS), bool(self.ops[k] == OP_DEL)
+
+    def newlines(self):
+        # The columns of the ocr newlines
+        return np.flatnonzero(self.ocrd_codes() == ord('\n'))
+
+    def lines(self):
+        # (start, end) of the columns of each line, as score_and_print
+        # splits them: after each ocr newline. The last line has no
+        # newline if the ocr string does not end with one.
+        start = 0
+        for k in self.newlines().tolist():
+            yield start, k+1
+            start = k+1
+        if start < len(self.ops):
+            yield start, len(self.ops)
+
+    def pack(self):
+        # As pack_alignment
+        return {'ocrd_start': int(self.ocrd_start), 'ops': self.ops.tobytes().translate(_PACKED).decode('ascii')}
+
+    @classmethod
+    def unpack(cls, ocrd, mand, packed):
+        ops = np.frombuffer(packed['ops'].encode('ascii').translate(_UNPACKED), dtype=np.uint8)
+        return cls(ocrd, mand, ops, packed['ocrd_start'])
+
+_PACKED = bytes.maketrans(bytes((OP_SUB, OP_DEL, OP_INS)), b'sdi')
+_UNPACKED = bytes.maketrans(b'sdi', bytes((OP_SUB, OP_DEL, OP_INS)))
+
+def _next(has, start):
+    positions = np.empty(len(has)+1, dtype=np.int32)
+    positions[0] = start
+    np.cumsum(has, dtype=np.int32, out=positions[1:])
+    positions[1:] += start
+    return positions
+
+def _codes(text):
+    # The code points of text, and -1 after them, for the index -1 of gaps
+    return np.frombuffer(text.encode('utf-32-le', 'surrogatepass') + b'\xff\xff\xff\xff', dtype='<i4')
+
+def _isin(codes, chars):
+    return np.isin(codes, [ord(c) for c in chars])
+
+# The characters for which str.isspace is true, U+3000 is the last one
+_SPACES = [c for c in range(0x3001) if chr(c).isspace()]
+
+def _isspace(codes):
+    return np.isin(codes, _SPACES)
+
+def _alignment(ocrdrec, mandrec):
+    # The Alignment of an alignment in either form: an Alignment (with
+    # mandrec None), or ocrdrec, mandrec
+    if isinstance(ocrdrec, Alignment):
+        return ocrdrec
+    return Alignment.from_lists(ocrdrec, mandrec)
 
 
 def markerror(listofstrings,index):
@@ -280,256 +1190,809 @@ def markerror(listofstrings,index):
 
 
 
-def score_and_print(ocrdrec,mandrec):
+def score_and_print(ocrdrec,mandrec=None,options=None,quiet=False,markup=True,wrong_words=None):
     # With the alignment, go through line by line, character by character to count errors, characters, words, etc.
     # Also marks the errors in a printable way and prints the alignment and scores to the screen
+    # options are the AlignOptions of the alignment, by default those of the OPT globals
+    #
+    # The alignment is an Alignment (with mandrec None), or ocrdrec,
+    # mandrec as lists, see _alignment. The columns are classified all at
+    # once, as arrays over the code points of their characters.
+    #
+    # With quiet, the errors are not printed. Without markup, the lines
+    # with the errors marked are not made (an empty list is returned for
+    # them). With wrong_words (a Counter), the ocr words with errors are
+    # counted there as they are found: the words of the marked lines with
+    # a mark in them, without the '°' (including the empty words of
+    # marked whitespace), as main used to pick them out of the lines.
+    options = _options(options)
+    alignment = _alignment(ocrdrec, mandrec)
     output=[]
-    output_mand = []
-    if ocrdrec == []:
-        return 0, 0, 0, 0, 0, 0, 0, [], defaultdict(Counter)
-#        return charactererrors, characters, worderrors, words, unaligned_ocr_whitespaces, unaligned_man_whitespaces, aligned_whitespaces
 
-    newlines = [i for i,char in enumerate(ocrdrec) if char=='\n']
-#    if not newlines or not newlines[-1] == len(ocrdrec)-1:
- #       newlines.append(len(ocrdrec)-1)
-    i0 = 0
-    charactererrors = 0
-    characters = 0
-    worderrors = 0 # number of words containing
-    words = 0
-    unaligned_ocr_whitespaces = 0
-    unaligned_man_whitespaces = 0
-    aligned_whitespaces = 0
-    mismatch_counter = defaultdict(Counter)
-
-
-    errors_in_current_word = False
-    characters_in_mandword = False
-
-    for i in newlines:
-        ocrdline = ocrdrec[i0:i+1]
-        mandline = mandrec[i0:i+1]
-        i0 = i+1
-
-        try:
-            ignorable_prefix = next(i for i,(o,m) in enumerate(zip(ocrdline,mandline))
-                                    if o not in ('','\n','\t',' ') or m not in ('','\n','\t',' '))
-        except StopIteration:
-            ignorable_prefix = len(ocrdline)
-
-        try:
-            ignorable_suffix = len(ocrdline)-next(i for i,(o,m) in enumerate(reversed(list(zip(ocrdline,mandline))))
-                                                  if o not in ('','\n','\t',' ','-','\xad') or m not in ('','\n','\t',' '))
-        #                                                                       ^^^^ End of line hyphens are ignorable in the OCR.
-        #                                                                            BUG! may ignore several line-final hyphens in a row
-        except StopIteration:
-            ignorable_suffix = 0
-
-        # for i,o in enumerate(ocrdline):
-        #     if o == '\n':
-        #         ocrdline[i] = '\u2424' # unicode ␤  (newline)
-        #     elif o == '\t':
-        #         ocrdline[i] = '\u2409' # unicode ␉  ([horizontal] tab)
-        #
-        # for i,m in enumerate(mandline):
-        #     if m == '\n':
-        #         mandline[i] = '\u2424'
-        #     elif m == '\t':
-        #         mandline[i] = '\u2409'
-
-        # compare line on character basis
-        for i,(o,m) in enumerate(zip(ocrdline,mandline)):
-
-            # All the `pass' cases are considered correct
-            if ignorable_suffix <= i or i < ignorable_prefix:
-                # if not o:
-                #     ocrdline[i] = '\u03F5' # unicode epsilon
-                if not m:
-                    mandline[i] = '\u03F5'
-                pass
-            elif o and o in '-\u2014\xad' and m and m in '-\u2014\xad': # (soft-)hyphen and m-dash considered equal
-                pass
-            elif o in ('\u2424','\u2409',' ') and m in ('\u2409',' '):
-                aligned_whitespaces += 1
-                pass
-            elif OPTnewlines_in_man and m=='\u2424' and o in ('\u2424','\u2409',' '):
-                aligned_whitespaces += 1
-                pass
-            elif o == '-' and m == '\u00ad': # hyphen and soft hyphen considered equal
-                pass
+    # The lines end with the ocr newlines; as always, the columns after
+    # the last one are not scored
+    o = alignment.ocrd_codes()
+    newlines = np.flatnonzero(o == ord('\n'))
+    if not len(newlines):
+        return 0, 0, 0, 0, 0, 0, 0, [], ConfusionMatrix()
+#        return charactererrors, characters, worderrors, words, unaligned_ocr_whitespaces, unaligned_man_whitespaces, aligned_whitespaces
+    n = newlines[-1]+1
+    starts = np.concatenate(([0], newlines[:-1]+1))
+    column = np.arange(n, dtype=np.int32)
+    o = o[:n]
+    m = alignment.mand_codes()[:n]
+
+    # whitespace (and gaps) at the beginning and end of each line is
+    # ignorable, and so are end of line hyphens in the OCR.
+    # BUG! may ignore several line-final hyphens in a row
+    mblank = (m < 0) | _isin(m, '\n\t ')
+    ignorable_prefix = np.minimum.reduceat(np.where(((o < 0) | _isin(o, '\n\t ')) & mblank, n, column), starts)
+    ignorable_suffix = np.maximum.reduceat(np.where(((o < 0) | _isin(o, '\n\t -\xad')) & mblank, 0, column+1), starts)
+    lengths = np.diff(np.append(starts, n))
+    ignorable = (column < np.repeat(ignorable_prefix, lengths)) | (column >= np.repeat(np.maximum(ignorable_suffix, starts), lengths))
+
+    # All the cases considered correct: (soft-)hyphens and m-dashes are
+    # equal, and so are whitespaces (and newlines in the manual string
+    # with newlines_in_man)
+    hyphens = _isin(o, '-\u2014\xad') & _isin(m, '-\u2014\xad')
+    whitespace = _isin(o, '\u2424\u2409 ') & (_isin(m, '\u2409 ') | (options.newlines_in_man & (m == ord('\u2424'))))
 # Special cases if certain characters are to be ignored in the total count
 #            elif o == '*':
 #                characters -= 1
 #            elif m and m in u'åöäÅÖÄëË':
 #                characters -= 1
-            elif o==m:
-                pass
-
-            # The rest constitutes an error case
-            else:
-                print(o, m)
-                mismatch_counter[m][o] += 1
-                charactererrors += 1
-
-                # if not o:
-                #     ocrdline[i] = '\u03F5' # unicode epsilon
-                if not m:
-                    mandline[i] = '\u03F5'
-
-
-                markerror(ocrdline,i)
-                markerror(mandline,i)
-
-                if o in (' ','\u2424','\u2409'):
-                    unaligned_ocr_whitespaces += 1
-
-                if m in (' ','\u2424','\u2409'):
-                    unaligned_man_whitespaces += 1
-                else:
-                    errors_in_current_word = True
-
-
-            if m:
-                characters +=1
-
-            # rather rudimentary word counting, only segments at ' ' (space).
-            if m in ('\u2424','\u2409',' '):
-                if characters_in_mandword:
-                    words += 1
-                    if errors_in_current_word:
-                        worderrors += 1
-                characters_in_mandword = False
-                errors_in_current_word = False
-            elif m:
-                characters_in_mandword = True
-
-        # print the alignment with markup to the screen, with a running score counter for this page
-        #print(( ''.join(char for char in ocrdline), '\tce: %s, #c: %s, we: %s, #w: %s' % (charactererrors, characters, worderrors, words)))
-        # f= open("demofile.txt", "a")
-        # f.write(''.join(char for char in ocrdline))
-        #print(( ''.join(char for char in mandline)))
-        #print()
-        output.append(''.join(char for char in ocrdline)+'\n')
-        output_mand.append(''.join(char for char in mandline)+'\n')
-
-    if characters_in_mandword:
-        words += 1
-    if errors_in_current_word:
-        worderrors += 1
+    error = ~ignorable & ~hyphens & ~whitespace & (o != m)
+
+    # The rest constitutes an error case
+    errors = np.flatnonzero(error)
+    ocrdchars = alignment.ocrd_chars(errors)
+    mandchars = alignment.mand_chars(errors)
+    if not quiet:
+        for c, d in zip(ocrdchars, mandchars):
+            print(c, d)
+    mws = _isin(m, ' \u2424\u2409')
+    charactererrors = len(errors)
+    characters = int(np.count_nonzero(m >= 0))
+    aligned_whitespaces = int(np.count_nonzero(~ignorable & whitespace))
+    unaligned_ocr_whitespaces = int(np.count_nonzero(error & _isin(o, ' \u2424\u2409')))
+    unaligned_man_whitespaces = int(np.count_nonzero(error & mws))
+
+    # rather rudimentary word counting, only segments at ' ' (space): a
+    # word is the columns up to a manual whitespace, it counts if it has
+    # manual characters, and as an error if it also has an error that
+    # is not the whitespace. The words run over line ends.
+    # The last word is the one after the last manual whitespace (empty
+    # if that is the last column), which counts as an error without
+    # manual characters too, as the loop did.
+    word = np.cumsum(mws, dtype=np.int32) - mws
+    last = int(np.count_nonzero(mws))
+    has_chars = np.bincount(word[(m >= 0) & ~mws], minlength=last+1) > 0
+    has_errors = np.bincount(word[error & ~mws], minlength=last+1) > 0
+    words = int(np.count_nonzero(has_chars))
+    worderrors = int(np.count_nonzero(has_chars[:-1] & has_errors[:-1]) + has_errors[-1])
+
+    # the lines of the ocr with the errors marked, see markerror
+    if markup:
+        errorlist = errors.tolist()
+        firsts = np.searchsorted(errors, starts).tolist() + [len(errors)]
+        for l, (start, end) in enumerate(zip(starts.tolist(), (newlines+1).tolist())):
+            ocrdline = []
+            for e in range(firsts[l], firsts[l+1]):
+                ocrdline.append(alignment.ocrd_text(start, errorlist[e]))
+                ocrdline.append(ocrdchars[e])
+                markerror(ocrdline, -1)
+                start = errorlist[e]+1
+            ocrdline.append(alignment.ocrd_text(start, end))
+            output.append(''.join(ocrdline)+'\n')
+
+    # the words of the marked ocr lines, split at whitespace; a marked
+    # whitespace ends one word with a mark and begins the next
+    if wrong_words is not None:
+        _count_wrong_words(alignment, o, error, wrong_words)
+
+    mismatch_counter = ConfusionMatrix()
+    if len(errors):
+        mismatch_counter.add_pairs(mandchars, ocrdchars)
 
     return charactererrors, characters, worderrors, words, unaligned_ocr_whitespaces, unaligned_man_whitespaces, aligned_whitespaces, output, mismatch_counter
 
+def _count_wrong_words(alignment, o, error, wrong_words):
+    # For score_and_print: count the ocr words with an error in
+    # wrong_words. The words end at each ocr whitespace column; a word
+    # has an error if one of its columns, or the whitespace column before
+    # or after it, is an error (the one before not if it is a newline,
+    # the lines are marked one by one), or if it holds a '°°' of its
+    # own. An error at a newline also counts as an empty word after the
+    # word the newline ends.
+    space = np.flatnonzero(_isspace(o))
+    starts = np.concatenate(([0], space[:-1]+1))
+    before = np.concatenate(([0], np.cumsum(error))) # the number of errors before each column
+    newline = o[space] == ord('\n')
+    marked = (before[space] > before[starts]) | error[space]
+    marked[1:] |= error[space[:-1]] & ~newline[:-1]
+    first = alignment._ocrd_next[0]
+    end = alignment._ocrd_next[space[-1]]
+    for mark in re.finditer('(?=°°)', alignment.ocrd[first:end]):
+        marked[np.searchsorted(alignment.ocrd_index[space], first+mark.start())] = True
+    for k in np.flatnonzero(marked | newline & error[space]).tolist():
+        if marked[k]:
+            wrong_words[alignment.ocrd_text(starts[k], space[k]).replace('°','')] += 1
+        if newline[k] and error[space[k]]:
+            wrong_words[''] += 1
+
 
 
 # Options to control the stripping of lines at the beginning resp end
 OPTstripbeg = False
 OPTstripend = False
 OPTnewlines_in_man = False
-def main(ocr_paths, truth_paths, output_filename, mode=None):
-    output = []
-    print(zip(ocr_paths,truth_paths))
-    if mode == '-sb':
-        OPTstripbeg = True
-    elif mode == '-se':
-        OPTstripend = True
-    elif mode == '-nm':
-        OPTnewlines_in_man = True
 
+# The options of one alignment, given to charalign, score_and_print etc
+# per call. Where none are given, those of the OPT globals are used.
+AlignOptions = namedtuple('AlignOptions', 'stripbeg stripend newlines_in_man', defaults=(False, False, False))
+
+# The options of the modes of main
+MODES = {
+    None: AlignOptions(),
+    '-sb': AlignOptions(stripbeg=True),
+    '-se': AlignOptions(stripend=True),
+    '-nm': AlignOptions(newlines_in_man=True),
+    }
+
+def _options(options):
+    if options is None:
+        return AlignOptions(OPTstripbeg, OPTstripend, OPTnewlines_in_man)
+    return options
+
+def evaluate(ocrdpath, mandpath, band=None, engine='python', wordmode='dp', anchorcheck=False, cache=None, screen={},
+             options=None, timing=False, quiet=False, normalized=None):
+    # Read, align and score one page. Returns a dict with
+    #   hallucination:    True if the ocr is too far off to be aligned
+    #                     (see screen_page, with the thresholds in
+    #                     screen), and then only
+    #   reason:           why, see screen_page
+    #   similarity:       see screen_page
+    #   counts:           the numbers of score_and_print
+    #   mismatch_counter: see score_and_print
+    #   wrong_words:      the words with errors and their counts, see score_and_print
+    #   wordcounts:       the numbers of worderrors (or worderrors_from_alignment, see main)
+    #   wordcheck:        the numbers of worderrors_from_alignment, when wordmode is 'validate'
+    #   anchorcheck:      the scores of the anchored and the optimal alignment, when anchorcheck
+    # Only small things are returned, so that pages can be evaluated in
+    # other processes, see main.
+    #
+    # options are the AlignOptions to align and score with. With a list
+    # of them, a list of results is returned, one for each, from one
+    # fill of the matrix where the engine allows it (see charalign).
+    #
+    # With a cache directory, the result is looked up there by the
+    # contents of the files and the options, and stored there if it is
+    # not found, see _cache_key.
+    #
+    # The paths may be in zip archives, see corpus.py.
+    #
+    # With timing, each result also holds the time spent in each stage of
+    # the evaluation, as 'timing', see _page_timing.
+    #
+    # With quiet, the character errors are not printed, see score_and_print.
+    #
+    # The texts are normalized as in data_cleaning (OCR and GOLD); with
+    # a normalized directory, they are read from that cache of normalized
+    # texts, see data_cleaning.cached_normalize.
+    global _stats
+    _stats = {} if timing else None
+    start = time.perf_counter(), time.process_time()
+
+    with _stage('read'):
+        # codecs.open('utf8') no gusto universal newlines???
+        if normalized:
+            ocrd = data_cleaning.cached_normalize(normalized, ocrdpath, **data_cleaning.OCR)
+            mand = data_cleaning.cached_normalize(normalized, mandpath, **data_cleaning.GOLD)
+        else:
+            ocrd = data_cleaning.normalize(corpus.read_text(ocrdpath), **data_cleaning.OCR)
+            mand = data_cleaning.normalize(corpus.read_text(mandpath), **data_cleaning.GOLD)
+
+    variants = [_options(o) for o in options] if isinstance(options, list) else [_options(options)]
+    evaluations = [None]*len(variants)
+    if cache:
+        keys = [_cache_key(ocrd, mand, (o, band, engine, wordmode, anchorcheck, sorted(screen.items()))) for o in variants]
+        for k, key in enumerate(keys):
+            entry = _cache_get(cache, key)
+            if entry is not None:
+                evaluations[k] = entry['evaluation']
+
+    todo = [k for k, evaluation in enumerate(evaluations) if evaluation is None]
+    if todo:
+        done = _evaluate(ocrd, mand, [variants[k] for k in todo], band, engine, wordmode, anchorcheck, screen, quiet)
+        for k, (evaluation, alignment) in zip(todo, done):
+            evaluations[k] = evaluation
+            if cache:
+                entry = {'evaluation': evaluation}
+                if alignment is not None:
+                    entry['alignment'] = alignment.pack()
+                _cache_put(cache, keys[k], entry)
+
+    if timing:
+        page = _page_timing(_stats, start, (len(ocrd)+1)*(len(mand)+1))
+        _stats = None
+        for evaluation in evaluations:
+            evaluation['timing'] = page
+    return evaluations if isinstance(options, list) else evaluations[0]
+
+def _evaluate(ocrd, mand, variants, band, engine, wordmode, anchorcheck, screen, quiet=False):
+    # evaluate for the texts of a page, for each of the AlignOptions in
+    # variants. Returns a list of (evaluation, alignment), the Alignment
+    # is None for hallucinations.
+
+    # pages screened as 'bounded' count as hallucinations (reason 'cost')
+    # if they have no alignment scoring at most budget per manual
+    # character, see charalign(max_cost)
+    screen = dict(screen)
+    budget = screen.pop('budget', SCREEN_BUDGET)
+    with _stage('screen'):
+        decision, reason, similarity = screen_page(ocrd, mand, **screen)
+    if decision == 'skip':
+        return [({'hallucination': True, 'reason': reason, 'similarity': similarity}, None) for _ in variants]
+
+    with _stage('charalign'):
+        if decision == 'bounded':
+            alignments = charalign(ocrd,mand,max_cost=budget*len(mand),options=variants,compact=True)
+        else:
+            alignments = charalign(ocrd,mand,band=band,engine=engine,options=variants,compact=True)
+
+    done = []
+    for options, alignment in zip(variants, alignments):
+        if alignment is None:
+            done.append(({'hallucination': True, 'reason': 'cost', 'similarity': similarity}, None))
+            continue
+        wrong_words = Counter()
+        with _stage('score_and_print'):
+            chrerrs, chrs, wrderrs, wrds, ua_o_wh, ua_m_wh, a_wh, _, mismatch_counter = score_and_print(
+                alignment,options=options,quiet=quiet,markup=False,wrong_words=wrong_words)
+        evaluation = {
+            'hallucination': False,
+            'similarity': similarity,
+            'counts': (chrerrs, chrs, wrderrs, wrds, ua_o_wh, ua_m_wh, a_wh),
+            'mismatch_counter': mismatch_counter,
+            'wrong_words': wrong_words,
+            }
+        with _stage('worderrors'):
+            if wordmode == 'alignment':
+                evaluation['wordcounts'] = worderrors_from_alignment(alignment)
+            else:
+                evaluation['wordcounts'] = worderrors(alignment)
+            if wordmode == 'validate':
+                evaluation['wordcheck'] = worderrors_from_alignment(alignment)
+        if anchorcheck:
+            with _stage('anchorcheck'):
+                evaluation['anchorcheck'] = (_charalign_anchored(ocrd,mand,options,withcost=True)[3], alignment_score(ocrd,mand,options))
+        done.append((evaluation, alignment))
+    return done
+
+# Instrumentation of evaluate, see main(report). While a page is
+# evaluated with timing, _stats holds the wall and cpu time spent in
+# each stage so far; else it is None and _stage costs next to nothing.
+_stats = None
+
+def _stage(name):
+    # with _stage(name): adds the time of the block to stage name
+    return _timed(name) if _stats is not None else contextlib.nullcontext()
+
+@contextlib.contextmanager
+def _timed(name):
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        t = _stats.setdefault(name, [0.0, 0.0])
+        t[0] += time.perf_counter()-wall
+        t[1] += time.process_time()-cpu
+
+def _peak_rss():
+    # peak resident set size of this process in kB, or None where unknown
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def _page_timing(stats, start, cells):
+    # The timing of a page: its wall and cpu time, those of each stage
+    # (traceback is part of charalign, 'fill' is the rest of it), the
+    # size of the matrix in cells and how many cells per second were
+    # filled in, and the peak memory of the process so far
+    stages = {name: {'wall': wall, 'cpu': cpu} for name, (wall, cpu) in stats.items()}
+    if 'charalign' in stages:
+        traceback = stages.get('traceback', {'wall': 0.0, 'cpu': 0.0})
+        stages['fill'] = {k: stages['charalign'][k]-traceback[k] for k in ('wall', 'cpu')}
+    fill = stages.get('fill', {}).get('wall')
+    return {
+        'wall': time.perf_counter()-start[0],
+        'cpu': time.process_time()-start[1],
+        'stages': stages,
+        'cells': cells,
+        'cells_per_second': cells/fill if fill else None,
+        'peak_rss_kb': _peak_rss(),
+        }
+
+def write_report(filename, pages, stages, wall, slowest=10):
+    # Write the timing report of main as JSON: totals over the run, per
+    # stage (summed over the pages, plus the stages of main itself), and
+    # the slowest pages. pages holds (file, timing of _page_timing).
+    totals = defaultdict(lambda: {'wall': 0.0, 'cpu': 0.0})
+    for _, page in pages:
+        for name, t in page['stages'].items():
+            totals[name]['wall'] += t['wall']
+            totals[name]['cpu'] += t['cpu']
+    for name, t in stages.items():
+        totals[name] = t
+    cells = sum(page['cells'] for _, page in pages if 'fill' in page['stages'])
+    fill = totals['fill']['wall'] if 'fill' in totals else 0.0
+    rss = [page['peak_rss_kb'] for _, page in pages if page['peak_rss_kb'] is not None]
+    report = {
+        'pages': len(pages),
+        'wall': wall,
+        'pages_per_second': len(pages)/wall if wall else None,
+        'stages': dict(totals),
+        'cells': cells,
+        'cells_per_second': cells/fill if fill else None,
+        'peak_cells': max((page['cells'] for _, page in pages), default=0),
+        'peak_rss_kb': max(rss + [_peak_rss() or 0]),
+        'slowest': [dict(page, file=fn) for fn, page in sorted(pages, key=lambda p: -p[1]['wall'])[:slowest]],
+        }
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+
+def profile_page(ocrdpath, mandpath, statsfile=None, top=30, **kwargs):
+    # Evaluate one page (kwargs as for evaluate) under cProfile, print
+    # the top functions by cumulative time and, with statsfile, save the
+    # profile there (for pstats, snakeviz etc). Returns the evaluation.
+    profiler = cProfile.Profile()
+    evaluation = profiler.runcall(evaluate, ocrdpath, mandpath, **kwargs)
+    if statsfile:
+        profiler.dump_stats(statsfile)
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(top)
+    return evaluation
+
+# Thresholds of screen_page
+SCREEN_LENGTH = 100  # most characters the texts may differ in length
+SCREEN_NGRAM = 3     # length of the character n-grams compared
+SCREEN_SKIP = 0.25   # similarity below which a page is not aligned
+SCREEN_BOUNDED = 0.5 # similarity below which only an alignment within SCREEN_BUDGET is looked for
+SCREEN_BUDGET = 0.4  # score per manual character
+
+def screen_page(ocrd, mand, length=SCREEN_LENGTH, n=SCREEN_NGRAM, skip=SCREEN_SKIP, bounded=SCREEN_BOUNDED):
+    # Decide, in time linear in the length of the texts, whether the ocr
+    # is worth aligning to the manual text. Hallucinated ocr of about
+    # the right length would otherwise go through the quadratic
+    # alignment only to give junk scores. Returns (decision, reason,
+    # similarity), where decision is
+    #   'skip':    the page is a hallucination, because of reason: 'length'
+    #              if the lengths differ by more than length characters,
+    #              'ngrams' if the similarity is below skip
+    #   'bounded': the similarity is below bounded, only look for an
+    #              alignment within a budget, see evaluate
+    #   'full':    align as asked
+    # The similarity is the share of the character n-grams of the longer
+    # text that are matched by n-grams of the other, from 0 to 1. For
+    # ocr of the same page it is mostly above 0.75 in our corpus, for
+    # unrelated pages below 0.25.
+    ocrdgrams = Counter(ocrd[k:k+n] for k in range(len(ocrd)-n+1))
+    mandgrams = Counter(mand[k:k+n] for k in range(len(mand)-n+1))
+    total = max(len(ocrd), len(mand)) - n + 1
+    similarity = sum((ocrdgrams & mandgrams).values()) / total if total > 0 else 1.0
+    if abs(len(ocrd) - len(mand)) > length:
+        return 'skip', 'length', similarity
+    if similarity < skip:
+        return 'skip', 'ngrams', similarity
+    if similarity < bounded:
+        return 'bounded', None, similarity
+    return 'full', None, similarity
+
+# Version of the alignment and scoring. Change it when a change makes
+# charalign, score_and_print or the word counts give other results, so
+# that results cached by earlier versions are not used.
+ALIGN_VERSION = 4
+
+def _cache_key(ocrd, mand, options):
+    # The results of a page depend on its (normalized) texts, the
+    # alignment options (AlignOptions and the rest) and the version of
+    # the code, and on nothing else
+    h = hashlib.sha256()
+    h.update(json.dumps([ALIGN_VERSION, options]).encode('utf-8'))
+    for text in (ocrd, mand):
+        data = text.encode('utf-8')
+        h.update(b'%d:' % len(data))
+        h.update(data)
+    return h.hexdigest()
+
+def _cache_path(cache, key):
+    return os.path.join(cache, key[:2], key + '.json')
+
+def _cache_get(cache, key):
+    # The cached entry for key, or None. The modification time of the
+    # file is the time of its last use, for evict_cache.
+    path = _cache_path(cache, key)
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return entry
+
+def _cache_put(cache, key, entry):
+    # Written to a temporary file first, so that processes reading the
+    # cache at the same time never see half an entry
+    path = _cache_path(cache, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False, default=_jsonable)
+    os.replace(tmp, path)
+
+def _jsonable(obj):
+    # The JSON of what evaluate returns that json does not know: the
+    # mismatch counts, as nested dicts
+    if isinstance(obj, ConfusionMatrix):
+        return obj.to_dict()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+def evict_cache(cache, maxsize):
+    # Remove the least recently used entries of the cache until it takes
+    # at most maxsize bytes
+    entries = []
+    for dirpath, _, filenames in os.walk(cache):
+        for fn in filenames:
+            if fn.endswith('.json'):
+                path = os.path.join(dirpath, fn)
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+    size = sum(e[1] for e in entries)
+    for _, entrysize, path in sorted(entries):
+        if size <= maxsize:
+            break
+        os.remove(path)
+        size -= entrysize
+
+def pack_alignment(ocrd, ocrdrec, mandrec, ocrd_start=None):
+    # The alignment in a compact form, for storing: where it starts in
+    # ocrd and a letter per column, 's' for an ocr and a manual
+    # character, 'd' for only an ocr character and 'i' for only a manual
+    # character. See unpack_alignment, and Alignment.pack. ocrd_start is
+    # as in Alignment.from_lists, pass it for alignments with -sb or -se.
+    return Alignment.from_lists(ocrdrec, mandrec, ocrd, None, ocrd_start).pack()
+
+def unpack_alignment(ocrd, mand, packed):
+    # ocrdrec, mandrec from pack_alignment
+    return Alignment.unpack(ocrd, mand, packed).to_lists()
+
+def main(ocr_paths, truth_paths, output_filename, mode=None, band=None, engine='python', wordmode='dp', jobs=1, anchorcheck=False,
+         cache=None, cache_size=1<<30, screen=None, report=None, quiet=False, normalized=None):
+    # mode is one of the modes of MODES ('-sb', '-se', '-nm' or None),
+    # or a list of them. With a list, each page is aligned once for all
+    # of them where the engine allows it (see charalign), and each mode
+    # is reported in files of its own, see mode_filename.
+    #
+    # wordmode selects how the word level counts (tWErrors etc) are made:
+    # 'dp' aligns the words anew (worderrors), 'alignment' reads them
+    # off the character alignment (worderrors_from_alignment), and
+    # 'validate' uses worderrors but also reports how far the counts
+    # of worderrors_from_alignment are from them, in the file
+    # 'worderrors_validation_' + output_filename
+    #
+    # With anchorcheck, the score of the anchored alignment (see
+    # _charalign_anchored) is compared to the optimal one for each page,
+    # in the file 'anchor_validation_' + output_filename
+    #
+    # screen holds thresholds for screen_page, which decides which pages
+    # are hallucinations and are not aligned. They are listed with the
+    # reason in the result files.
+    #
+    # ocr_paths and truth_paths are directories, or directories in zip
+    # archives, see corpus.py.
+    #
+    # The files are paired by page, see manifest.py, and the files
+    # without a counterpart are listed.
+    #
+    # With jobs > 1 the pages are evaluated in that many processes, the
+    # most costly first (see manifest.schedule). The results are merged
+    # in the order of the manifest all the same, so the output files are
+    # the same as when evaluated one by one.
+    #
+    # The result of each page is appended to records_filename(output_filename)
+    # as soon as it is done, one JSON object per line (with the number
+    # of the page in the manifest as 'page'), and the files
+    # 'final_' + output_filename, results_filename(output_filename) and
+    # 'wrong_words_' + output_filename are written from them at the end
+    # (which keeps them in memory until then).
+    # If a run breaks off, they can be written from the pages done so
+    # far with results_from_records.
+    #
+    # With a cache directory, pages evaluated before with the same
+    # options are looked up there instead of aligned again (see
+    # evaluate), and the cache is cut down to cache_size bytes at the
+    # end, dropping the entries used least recently.
+    #
+    # With a report filename, the time spent in each stage of the
+    # evaluation of each page is measured and a report written there,
+    # see write_report.
+    #
+    # With quiet, the character errors of each page are not printed.
+    #
+    # With a normalized directory, the texts are read from that cache of
+    # normalized texts (see data_cleaning), which is filled in with those
+    # not there yet.
+    start = time.perf_counter()
+    timings = []
+    modes = mode if isinstance(mode, list) else [mode]
+    filenames = [mode_filename(output_filename, m) for m in modes] if isinstance(mode, list) else [output_filename]
+    records = [[] for _ in modes]
+    worddiffs = [[] for _ in modes]
+    anchordiffs = [[] for _ in modes]
+    print(zip(ocr_paths,truth_paths))
 
+    manifest = corpus_manifest.build(ocr_paths, truth_paths)
+    print(*corpus_manifest.summary(manifest), sep='\n')
+    pairs = manifest['pairs']
+    task = functools.partial(evaluate, band=band, engine=engine, wordmode=wordmode, anchorcheck=anchorcheck, cache=cache,
+                             screen=screen or {}, options=[MODES[m] for m in modes], timing=bool(report), quiet=quiet, normalized=normalized)
+    ocrdpaths = [os.path.join(ocr_paths, pair['ocr']) for pair in pairs]
+    mandpaths = [os.path.join(truth_paths, pair['truth']) for pair in pairs]
+
+    pages = [None]*len(pairs)
+    with contextlib.ExitStack() as stack:
+        logs = [stack.enter_context(open(records_filename(fn), 'w', encoding='utf-8')) for fn in filenames]
+        if jobs > 1:
+            executor = stack.enter_context(ProcessPoolExecutor(jobs))
+            futures = {executor.submit(task, ocrdpaths[n], mandpaths[n]): n for n in corpus_manifest.schedule(manifest)}
+            evaluations = ((futures[future], future.result()) for future in as_completed(futures))
+        else:
+            evaluations = ((n, task(ocrdpaths[n], mandpaths[n])) for n in range(len(pairs)))
+
+        count = 1
+        for n, page in evaluations:
+            ocrdfile, mandfile = pairs[n]['ocr'], pairs[n]['truth']
+            print(ocrdfile, mandfile)
+            # log each page as soon as it is evaluated, so that a run
+            # that breaks off leaves the pages done so far
+            pages[n] = [dict(evaluation, ocr=ocrdfile, truth=mandfile, page=n) for evaluation in page]
+            for k, record in enumerate(pages[n]):
+                logs[k].write(json.dumps(record, ensure_ascii=False, default=_jsonable) + '\n')
+                logs[k].flush()
+            hallucinated = [evaluation for evaluation in page if evaluation['hallucination']]
+            if hallucinated:
+                print(f'{ocrdfile} is hallucinations! ({hallucinated[0]["reason"]})')
+            else:
+                print("Progress: ("+str(count)+'/'+str(len(pairs))+")")
+                count+=1
+
+    # in the order of the manifest, whatever order the pages were done in
+    for page in pages:
+        for k, record in enumerate(page):
+            records[k].append(record)
+            if not record['hallucination']:
+                if wordmode == 'validate':
+                    worddiffs[k].append((record['ocr'], tuple(record['wordcounts']), tuple(record['wordcheck'])))
+                if anchorcheck:
+                    anchordiffs[k].append((record['ocr'],)+tuple(record['anchorcheck']))
+        if report:
+            timings.append((page[0]['ocr'], page[0]['timing']))
+
+    writing = time.perf_counter(), time.process_time()
+    totals = []
+    for k, filename in enumerate(filenames):
+        results, total_mismatch_counter, hallucinations, wrong_words = merge_records(records[k])
+        write_results(filename, results, total_mismatch_counter, hallucinations, wrong_words)
+        if wordmode == 'validate':
+            write_worddiffs('worderrors_validation_' + filename, worddiffs[k])
+        if anchorcheck:
+            write_anchordiffs('anchor_validation_' + filename, anchordiffs[k])
+        totals.append((results, total_mismatch_counter, hallucinations))
+    if cache:
+        evict_cache(cache, cache_size)
+    if report:
+        write_report(report, timings, {'write': {'wall': time.perf_counter()-writing[0], 'cpu': time.process_time()-writing[1]}},
+                     time.perf_counter()-start)
+
+    return totals if isinstance(mode, list) else totals[0]
+
+def mode_filename(output_filename, mode):
+    # The output_filename of a mode, when main reports several
+    return output_filename if mode is None else mode.lstrip('-') + '_' + output_filename
+
+def records_filename(output_filename):
+    # The JSON Lines log of the per-page results of main
+    return 'records_' + os.path.splitext(output_filename)[0] + '.jsonl'
+
+def merge_records(records):
+    # Add up per-page results (of evaluate, with the names of the files
+    # as 'ocr' and 'truth') in the order given. Returns the results
+    # dict, the mismatch counts, the hallucination files (with the
+    # reason, see screen_page) and the counts of the wrong words of main.
     totalchrs = totalchrerrs = totalwrds = totalwrderrs = totalua_m_wh = totalua_o_wh = totala_wh = 0
     tWErrors = tWNoos = tWSubs = tWDels = tWIns = tWCount = 0
-    total_mismatch_counter = defaultdict(Counter)
-    mismatch_counter = defaultdict(Counter)
-    count=1
+    total_mismatch_counter = ConfusionMatrix()
     hallucinations = []
-    for ocrdfile, mandfile in zip(os.listdir(ocr_paths),os.listdir(truth_paths)):
-        print(ocrdfile, mandfile)
-        if len(os.listdir(ocr_paths)) != len(os.listdir(truth_paths)):
+    wrong_words = Counter()
+    for record in records:
+        if record['hallucination']:
+            hallucinations.append((record['ocr'], record.get('reason', 'length')))
             continue
-        else:
-            with codecs.open(os.path.join(ocr_paths, ocrdfile),'r','utf8') as f:
-                # codecs.open('utf8') no gusto universal newlines???
-                ocrd = f.read().replace('\r\n','\n').replace('\r','\n').strip()
-            with codecs.open(os.path.join(truth_paths, mandfile),'r','utf8') as f:
-                mand = f.read().replace('\r\n','\n').replace('\r','\n').replace('\ufeff', '').strip()
-
-            
-            if len(ocrd) > len(mand) + 100 or len(ocrd) < len(mand) - 100:
-                print(f'{ocrdfile} is hallucinations!')
-                hallucination = ocrdfile
-                hallucinations.append(hallucination)
-                continue
-            ocr_words = [word for line in ocrd for word in line.split()]
-            mandwords = [word for line in mand for word in line.split()]
-            for word in ocr_words:
-                word = remove_tags(word)
-            ocrdrec,mandrec = charalign(ocrd,mand)
-            chrerrs, chrs, wrderrs, wrds, ua_o_wh, ua_m_wh, a_wh, ocrdlines, mismatch_counter = score_and_print(ocrdrec,mandrec)
-            WErrors, WNoos, WSubs, WDels, WIns, WCount = worderrors(ocrdrec,mandrec)
-
-            # merge mismatch_counter into total_mismatch_counter
-            for m_char, inner_counter in mismatch_counter.items():
-                for o_char, dict_count in inner_counter.items():
-                    total_mismatch_counter[m_char][o_char] += dict_count
-            
-
-            totalchrerrs += chrerrs
-            totalchrs += chrs
-            totalwrderrs += wrderrs
-            totalwrds += wrds
-            totalua_m_wh += ua_m_wh
-            totalua_o_wh += ua_o_wh
-            totala_wh += a_wh
-
-            tWErrors += WErrors
-            tWNoos += WNoos
-            tWSubs += WSubs
-            tWDels += WDels
-            tWIns += WIns
-            tWCount += WCount
-
-            if totalchrs == 0:
-                continue
-                
-            results = {
-                'total_chrerrs' : totalchrerrs,
-                'total_chrs' : totalchrs,
-                'cer': totalchrerrs/totalchrs,
-                'total_wrderrs' : totalwrderrs,
-                'total_wrds' : totalwrds,
-                'wer' : totalwrderrs/totalwrds,
-                'unaligned gt whitespaces' : totalua_m_wh,
-                'unaligned ocr whitespaces' : totalua_o_wh,
-                'aligned whitespaces' : totala_wh,
-                'tWErrors' : tWErrors,
-                'tWNoos' : tWNoos,
-                'tWSubs' : tWSubs,
-                'tWDels' : tWDels,
-                'tWIns' : tWIns,
-                'tWCount' : tWCount
-                }
-            words = [word for line in ocrdlines for word in line.split()]
-            for word in words:
-                if('°°'in word):
-                    word = word.replace('°','')
-                    output.append(word)
-            print("Progress: ("+str(count)+'/'+str(len(os.listdir(ocr_paths)))+")")
-            count+=1
-
-        f = open('final_' + output_filename, 'w', encoding='utf-8')
+        chrerrs, chrs, wrderrs, wrds, ua_o_wh, ua_m_wh, a_wh = record['counts']
+        WErrors, WNoos, WSubs, WDels, WIns, WCount = record['wordcounts']
+
+        # merge mismatch_counter into total_mismatch_counter; records
+        # read back from JSON (logs, the cache) hold it as nested dicts
+        mismatch_counter = record['mismatch_counter']
+        if not isinstance(mismatch_counter, ConfusionMatrix):
+            mismatch_counter = ConfusionMatrix.from_dict(mismatch_counter)
+        total_mismatch_counter += mismatch_counter
+
+        totalchrerrs += chrerrs
+        totalchrs += chrs
+        totalwrderrs += wrderrs
+        totalwrds += wrds
+        totalua_m_wh += ua_m_wh
+        totalua_o_wh += ua_o_wh
+        totala_wh += a_wh
+
+        tWErrors += WErrors
+        tWNoos += WNoos
+        tWSubs += WSubs
+        tWDels += WDels
+        tWIns += WIns
+        tWCount += WCount
+
+        if totalchrs == 0:
+            continue
+        # a list of the words in records from before they were counted
+        wrong_words.update(record['wrong_words'])
+
+    results = {}
+    if totalchrs:
+        results = {
+            'total_chrerrs' : totalchrerrs,
+            'total_chrs' : totalchrs,
+            'cer': totalchrerrs/totalchrs,
+            'total_wrderrs' : totalwrderrs,
+            'total_wrds' : totalwrds,
+            'wer' : totalwrderrs/totalwrds,
+            'unaligned gt whitespaces' : totalua_m_wh,
+            'unaligned ocr whitespaces' : totalua_o_wh,
+            'aligned whitespaces' : totala_wh,
+            'tWErrors' : tWErrors,
+            'tWNoos' : tWNoos,
+            'tWSubs' : tWSubs,
+            'tWDels' : tWDels,
+            'tWIns' : tWIns,
+            'tWCount' : tWCount
+            }
+    return results, total_mismatch_counter, hallucinations, wrong_words
+
+def results_filename(output_filename):
+    # The machine readable counterpart of 'final_' + output_filename,
+    # see write_results
+    return 'final_' + os.path.splitext(output_filename)[0] + '.json'
+
+def write_results(output_filename, results, total_mismatch_counter, hallucinations, wrong_words):
+    # Write the totals and mismatch counts to 'final_' + output_filename,
+    # and the same as JSON to results_filename(output_filename): an
+    # object with the totals as 'results', the mismatch counts as
+    # 'confusion', a list of [manual char, ocr char, count], and the
+    # 'hallucinations' files as [file, reason]. The counts of the wrong
+    # words go to 'wrong_words_' + output_filename.
+    with open('final_' + output_filename, 'w', encoding='utf-8') as f:
         for k, v in results.items():
             f.write(f'{k} {v} \n')
-        for k, v in total_mismatch_counter.items():
-            f.write(f'{k} {v} \n')
+        total_mismatch_counter.write_text(f, end=' \n')
         f.write('Hallucination files \n')
-        for h in hallucinations:
-            f.write(f'{h} \n')
-
-        wrong_words = Counter(output)
-
-        f2 = open('wrong_words_' + output_filename, 'w', encoding='utf-8')
-        f2.write(f'{wrong_words}')
-
+        for h, reason in hallucinations:
+            f.write(f'{h} {reason} \n')
+
+    with open(results_filename(output_filename), 'w', encoding='utf-8') as f:
+        json.dump({
+            'results': results,
+            'confusion': total_mismatch_counter.triples(),
+            'hallucinations': hallucinations,
+            }, f, ensure_ascii=False)
+
+    with open('wrong_words_' + output_filename, 'w', encoding='utf-8') as f:
+        f.write(f'{wrong_words}')
+
+def results_from_records(output_filename, recordsfile=None):
+    # Write the files of main from its log of per-page results (by
+    # default records_filename(output_filename)), e.g. after a run that
+    # broke off. A last line cut off in the middle is skipped. The pages
+    # are merged in the order of the manifest, as in main.
+    records = []
+    with open(recordsfile or records_filename(output_filename), encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    records.sort(key=lambda record: record.get('page', 0))
+    results, total_mismatch_counter, hallucinations, wrong_words = merge_records(records)
+    write_results(output_filename, results, total_mismatch_counter, hallucinations, wrong_words)
     return results, total_mismatch_counter, hallucinations
 
+def write_worddiffs(filename, worddiffs):
+    # Report how the word level counts of worderrors_from_alignment
+    # differ from those of worderrors: totals over the corpus, and each
+    # file where they differ. worddiffs holds (file, worderrors counts,
+    # worderrors_from_alignment counts).
+    keys = ('tWErrors', 'tWNoos', 'tWSubs', 'tWDels', 'tWIns', 'tWCount')
+    dp = [sum(d[1][k] for d in worddiffs) for k in range(len(keys))]
+    al = [sum(d[2][k] for d in worddiffs) for k in range(len(keys))]
+    differing = [d for d in worddiffs if d[1] != d[2]]
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f'files {len(worddiffs)} differing {len(differing)} \n')
+        for k, a, b in zip(keys, dp, al):
+            f.write(f'{k} {a} {b} {b-a} \n')
+        f.write('Differing files \n')
+        for fn, a, b in differing:
+            f.write(f'{fn} {a} {b} \n')
+    print(f'word counts from the alignment differ in {len(differing)} of {len(worddiffs)} files, tWErrors {dp[0]} vs {al[0]}')
+
+def write_anchordiffs(filename, anchordiffs):
+    # Report how often and how much the score of the anchored alignment
+    # is worse than the optimal one. anchordiffs holds (file, anchored
+    # score, optimal score).
+    differing = [d for d in anchordiffs if abs(d[1]-d[2]) > 1e-6]
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write(f'files {len(anchordiffs)} differing {len(differing)} \n')
+        f.write(f'anchored {sum(d[1] for d in anchordiffs)} optimal {sum(d[2] for d in anchordiffs)} \n')
+        f.write('Differing files \n')
+        for fn, a, b in differing:
+            f.write(f'{fn} {a} {b} \n')
+    print(f'anchored alignment scores differ from the optimal ones in {len(differing)} of {len(anchordiffs)} files')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Align OCR output with gold standard texts and score it.')
+    parser.add_argument('ocr_paths', help='directory with the ocr files')
+    parser.add_argument('truth_paths', help='directory with the gold standard files')
+    parser.add_argument('output_filename', help='suffix of the final_ and wrong_words_ result files')
+    parser.add_argument('-sb', dest='modes', action='append_const', const='-sb', help='strip lines at the beginning of the ocr')
+    parser.add_argument('-se', dest='modes', action='append_const', const='-se', help='strip lines at the end of the ocr')
+    parser.add_argument('-nm', dest='modes', action='append_const', const='-nm', help='newlines in the gold standard')
+    parser.add_argument('--all-modes', dest='modes', action='store_const', const=list(MODES),
+                        help='report the default mode and each of the above from one alignment per page')
+    parser.add_argument('--band', type=int, help='first fill in this band around the diagonal of the matrix, then only the cells that may be on a better alignment')
+    parser.add_argument('--engine', default='python', choices=('python','numpy','linear','anchored'))
+    parser.add_argument('--words', dest='wordmode', default='dp', choices=('dp','alignment','validate'),
+                        help='how the word level counts are made')
+    parser.add_argument('--jobs', type=int, default=1, help='number of processes evaluating pages')
+    parser.add_argument('--anchor-check', dest='anchorcheck', action='store_true',
+                        help='compare the scores of anchored and optimal alignments')
+    parser.add_argument('--cache', help='directory to cache page results in')
+    parser.add_argument('--screen-skip', dest='screen_skip', type=float, default=SCREEN_SKIP,
+                        help='n-gram similarity below which a page is a hallucination')
+    parser.add_argument('--screen-bounded', dest='screen_bounded', type=float, default=SCREEN_BOUNDED,
+                        help='n-gram similarity below which a page gets a cost-bounded alignment (see --screen-budget)')
+    parser.add_argument('--screen-budget', dest='screen_budget', type=float, default=SCREEN_BUDGET,
+                        help='score per manual character beyond which a screened page is a hallucination')
+    parser.add_argument('--cache-size', dest='cache_size', type=int, default=1024, help='size limit of the cache in MB')
+    parser.add_argument('--normalized', help='directory of the cache of normalized texts, see data_cleaning.py')
+    parser.add_argument('--quiet', action='store_true', help='do not print the character errors of each page')
+    parser.add_argument('--report', help='measure the stages of the evaluation, write a JSON report to this file')
+    parser.add_argument('--profile', metavar='OCRFILE',
+                        help='only evaluate the page of this ocr file under cProfile, save the profile as output_filename')
+    args = parser.parse_args()
+    # several modes are reported in files of their own, see main
+    mode = args.modes if args.modes and len(args.modes) > 1 else args.modes and args.modes[0]
+    screen = {'skip': args.screen_skip, 'bounded': args.screen_bounded, 'budget': args.screen_budget}
+    if args.profile:
+        # the gold standard file is paired as in main
+        pairs = corpus_manifest.build(args.ocr_paths, args.truth_paths)['pairs']
+        mandfile = next(pair['truth'] for pair in pairs if pair['ocr'] == args.profile)
+        options = [MODES[m] for m in mode] if isinstance(mode, list) else MODES[mode]
+        profile_page(os.path.join(args.ocr_paths, args.profile), os.path.join(args.truth_paths, mandfile), args.output_filename,
+                     band=args.band, engine=args.engine, wordmode=args.wordmode, screen=screen, options=options, quiet=args.quiet,
+                     normalized=args.normalized)
+        sys.exit()
+    main(args.ocr_paths, args.truth_paths, args.output_filename, mode, band=args.band,
+         engine=args.engine, wordmode=args.wordmode, jobs=args.jobs, anchorcheck=args.anchorcheck,
+         cache=args.cache, cache_size=args.cache_size<<20, screen=screen, report=args.report, quiet=args.quiet,
+         normalized=args.normalized)
+
 #main("-sb", ["/Users/simonpersson/Github/MasterThesis/Evaluation-script/OCROutput/Ocropus/Argus/ed_pg_a0002_ocropus_twomodel.txt"], ["/Users/simonpersson/Github/MasterThesis/Evaluation-script/ManuelTranscript/Argus/ed_pg_a0002.txt"], "test.txt")
@@ -0,0 +1,175 @@
+# Benchmark of the alignment hot paths: charalign with each engine,
+# worderrors, worderrors_from_alignment and score_and_print (on the
+# alignment as lists, and as an align.Alignment: ':compact'), on synthetic
+# pages from pages.py of 200 to 20000 characters. Reports the time (best
+# of a few runs) and the peak memory (tracemalloc) of each, and compares
+# them with a saved baseline: anything slower or bigger than the baseline
+# by more than the tolerance is reported as a REGRESSION and makes the
+# exit status 1.
+#
+#   python benchmarks/alignment.py                     # run and compare with the baseline, if any
+#   python benchmarks/alignment.py --save              # run and save as the baseline
+#   python benchmarks/alignment.py --sizes 200 1000 --only charalign:numpy
+#
+# Baselines depend on the machine, so they are not checked in; save one
+# before a change and compare after it.
+import sys
+import os
+import io
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+import contextlib
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import align
+import pages
+
+SIZES = (200, 1000, 5000, 20000)
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alignment_baseline.json')
+BAND = 100
+BUDGET = align.SCREEN_BUDGET
+
+# (name, largest page size it is run on, function of (ocrd, mand, alignment,
+# compact alignment)).
+# The full matrix engines are quadratic in time (python, linear) or memory
+# (numpy), and bounded and banded grow with the length times the number of
+# errors, so they are left out on the long pages.
+CASES = (
+    ('charalign:python', 2000, lambda o, m, a, c: align.charalign(o, m)),
+    ('charalign:numpy', 5000, lambda o, m, a, c: align.charalign(o, m, engine='numpy')),
+    ('charalign:banded', 5000, lambda o, m, a, c: align.charalign(o, m, band=BAND)),
+    ('charalign:linear', 1000, lambda o, m, a, c: align.charalign(o, m, engine='linear')),
+    ('charalign:anchored', 20000, lambda o, m, a, c: align.charalign(o, m, engine='anchored')),
+    ('charalign:bounded', 1000, lambda o, m, a, c: align.charalign(o, m, max_cost=BUDGET*len(m))),
+    ('worderrors', 20000, lambda o, m, a, c: align.worderrors(*a)),
+    ('worderrors_from_alignment', 20000, lambda o, m, a, c: align.worderrors_from_alignment(*a)),
+    ('score_and_print', 20000, lambda o, m, a, c: align.score_and_print(*a)),
+    ('score_and_print:quiet', 20000, lambda o, m, a, c: align.score_and_print(*a, quiet=True, markup=False, wrong_words=Counter())),
+    ('worderrors:compact', 20000, lambda o, m, a, c: align.worderrors(c)),
+    ('worderrors_from_alignment:compact', 20000, lambda o, m, a, c: align.worderrors_from_alignment(c)),
+    ('score_and_print:compact', 20000, lambda o, m, a, c: align.score_and_print(c)),
+    ('score_and_print:compact:quiet', 20000, lambda o, m, a, c: align.score_and_print(c, quiet=True, markup=False, wrong_words=Counter())),
+)
+
+def make_pages(sizes, seed, **kwargs):
+    # {size: (ocrd, mand, alignment, compact alignment)}, the alignment
+    # for the functions that take one made with the anchored engine,
+    # which is fast on all sizes and gives the same alignment on these
+    # pages
+    rng = random.Random(seed)
+    result = {}
+    for size in sizes:
+        ocrd, mand = pages.make_page(rng, size, **kwargs)
+        compact = align.charalign(ocrd, mand, engine='anchored', compact=True)
+        result[size] = ocrd, mand, compact.to_lists(), compact
+    return result
+
+def measure(f, args, repeat):
+    # (seconds, peak bytes): the best time of repeat runs, and the peak
+    # memory of one more run under tracemalloc, which slows things down
+    # too much to time them at the same time
+    best = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            gc.collect()
+            t = time.perf_counter()
+            f(*args)
+            t = time.perf_counter() - t
+            best = t if best is None else min(best, t)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            f(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+def run(sizes, seed, repeat, only=None, **kwargs):
+    # {'name size': {'seconds':, 'peak_kb':}}
+    data = make_pages(sizes, seed, **kwargs)
+    results = {}
+    for name, largest, f in CASES:
+        if only and name not in only:
+            continue
+        for size in sizes:
+            if size > largest:
+                continue
+            seconds, peak = measure(f, data[size], repeat)
+            results[f'{name} {size}'] = {'seconds': seconds, 'peak_kb': peak // 1024}
+            print(f'{name:28s}{size:7d}{seconds*1000:12.2f} ms{peak//1024:10d} kB', flush=True)
+    return results
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    # The regressions of results against baseline, as printable lines
+    regressions = []
+    for key, r in results.items():
+        b = baseline.get(key)
+        if b is None:
+            continue
+        if r['seconds'] > b['seconds'] * (1 + tolerance):
+            regressions.append(f'{key}: {r["seconds"]*1000:.2f} ms, baseline {b["seconds"]*1000:.2f} ms '
+                               f'({r["seconds"]/b["seconds"]:.2f}x)')
+        if r['peak_kb'] > b['peak_kb'] * (1 + memory_tolerance) + 64:
+            regressions.append(f'{key}: {r["peak_kb"]} kB, baseline {b["peak_kb"]} kB')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the alignment functions on synthetic pages')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='page sizes in characters')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement, the best is kept')
+    parser.add_argument('--only', nargs='+', help='only these functions, e.g. charalign:numpy worderrors')
+    parser.add_argument('--error-rate', type=float, default=0.08, help='ocr errors per character')
+    parser.add_argument('--line-length', type=int, default=60)
+    parser.add_argument('--hyphenation', type=float, default=0.3, help='share of line breaks in a word')
+    parser.add_argument('--hallucination-rate', type=float, default=0.0, help='share of pages with ocr of another text')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file (default benchmarks/alignment_baseline.json)')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 is 25%%')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1, help='allowed growth of peak memory')
+    args = parser.parse_args()
+
+    kwargs = dict(error_rate=args.error_rate, line_length=args.line_length, hyphenation=args.hyphenation,
+                  hallucination_rate=args.hallucination_rate)
+    results = run(args.sizes, args.seed, args.repeat, args.only, **kwargs)
+    setup = dict(kwargs, seed=args.seed)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                baseline = json.load(f)
+            if baseline.get('setup') != setup:
+                baseline = {}
+        baseline['setup'] = setup
+        baseline.setdefault('results', {}).update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f'saved baseline {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'no baseline {args.baseline}, save one with --save')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline['setup'] != setup:
+        print(f'baseline {args.baseline} is of other pages ({baseline["setup"]}), not compared')
+        return 1
+    regressions = compare(results, baseline['results'], args.tolerance, args.memory_tolerance)
+    if regressions:
+        print(f'\n{len(regressions)} REGRESSIONS against {args.baseline}:')
+        for line in regressions:
+            print('  ' + line)
+        return 1
+    print(f'no regressions against {args.baseline}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
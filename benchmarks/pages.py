@@ -0,0 +1,106 @@
+# Seeded generator of synthetic page pairs (ocr, gold standard) in the
+# style of the corpus: Swedish fraktur-era newspaper text with long s,
+# hyphenated line breaks, and ocr errors drawn from the confusions we
+# measured, see total_results_*_character_level.txt.
+#
+#   rng = random.Random(seed)
+#   ocrd, mand = make_page(rng, 5000, error_rate=0.08)
+import os
+import sys
+import random
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from confusion import ConfusionMatrix
+
+CONFUSION_FILES = (os.path.join(ROOT, 'total_results_abbyy_character_level.txt'),
+                   os.path.join(ROOT, 'total_results_chatgpt_character_level.txt'))
+
+WORDS = ('och', 'att', 'af', 'i', 'på', 'til', 'med', 'den', 'det', 'ſom', 'hwilken', 'hwilket', 'ſåſom', 'ſkall',
+         'ſig', 'ſin', 'warit', 'blifwit', 'hafwa', 'hafwer', 'uti', 'ifrån', 'efter', 'emot', 'öfwer', 'ſedan',
+         'Konungens', 'Kongl.', 'Maj:t', 'Stockholm', 'Götheborg', 'Riksdagen', 'tidningen', 'Herr', 'Fru',
+         'Rikets', 'Ständer', 'Regeringen', 'underdånigſt', 'nådigſt', 'förordning', 'kungörelſe', 'ſtaden',
+         'landet', 'folket', 'handel', 'ſjöfart', 'ſkepp', 'ankom', 'afgick', 'från', 'Lübeck', 'Hamburg',
+         'ſäd', 'råg', 'korn', 'hwete', 'tunnan', 'Rdr', 'ſk.', 'Banco', 'Riksgälds', 'priſet', 'wäl', 'ännu',
+         'deſſutom', 'nemligen', 'blott', 'äfwen', 'allenaſt', 'dock', 'men', 'eller', 'icke', 'ej', 'ſå',
+         'här', 'där', 'nu', 'wid', 'för', 'genom', 'under', 'mellan', 'Auction', 'förrättas', 'Måndagen',
+         'kl.', 'f.', 'm.', '1838', '12', 'ſtycken', 'gårdar', 'hemman', 'Socken', 'Härad', 'Län')
+
+def confusions(filenames=CONFUSION_FILES):
+    # {gold standard char: (ocr chars, weights)} from the mismatch counts
+    # of the result files; '' as ocr char is a deletion
+    counts = ConfusionMatrix()
+    for filename in filenames:
+        with open(filename, encoding='utf-8') as f:
+            counts += ConfusionMatrix.from_text(f.read())
+    return {m_char: (list(c), list(c.values())) for m_char, c in counts.items()}
+
+def make_text(rng, size, line_length=60, hyphenation=0.3):
+    # Gold standard text of about size characters in lines of about
+    # line_length, with a share hyphenation of the line breaks in a
+    # word ('-' at the end of the line)
+    lines = []
+    line = ''
+    total = 0
+    while total < size:
+        word = rng.choice(WORDS)
+        if len(line) + 1 + len(word) > line_length and line:
+            if len(word) > 4 and rng.random() < hyphenation:
+                k = rng.randint(2, len(word)-2)
+                lines.append(line + ' ' + word[:k] + '-')
+                word = word[k:]
+            else:
+                lines.append(line)
+            total += len(lines[-1]) + 1
+            line = word
+        else:
+            line = line + ' ' + word if line else word
+    lines.append(line)
+    return '\n'.join(lines)[:size].strip()
+
+def make_ocr(rng, mand, error_rate, table):
+    # Ocr of mand with about error_rate errors per character: confusions
+    # drawn from table (see confusions), and now and then an inserted
+    # character or a line break dropped in favour of a space
+    ocrd = []
+    for ch in mand:
+        if rng.random() >= error_rate:
+            ocrd.append(ch)
+        elif ch == '\n':
+            ocrd.append(rng.choice((' ', '\n\n')))
+        elif ch in table and rng.random() < 0.9:
+            ocrd.append(rng.choices(*table[ch])[0])
+        else:
+            ocrd.append(ch + rng.choice('.,\'-ilr'))
+    return ''.join(ocrd)
+
+def make_page(rng, size, error_rate=0.08, line_length=60, hyphenation=0.3, hallucination_rate=0.0, table=None):
+    # (ocrd, mand) for a page of about size characters. With probability
+    # hallucination_rate the ocr is of another text of the same length,
+    # as hallucinating transcribers produce.
+    table = table if table is not None else _default_table()
+    mand = make_text(rng, size, line_length, hyphenation)
+    if rng.random() < hallucination_rate:
+        source = make_text(rng, len(mand), line_length, hyphenation)
+    else:
+        source = mand
+    return make_ocr(rng, source, error_rate, table), mand
+
+_table = None
+def _default_table():
+    global _table
+    if _table is None:
+        _table = confusions()
+    return _table
+
+def write_corpus(directory, seed, sizes, **kwargs):
+    # A corpus for align.main: directory/ocr and directory/gt with a page
+    # pair for each size, kwargs as for make_page
+    rng = random.Random(seed)
+    for sub in ('ocr', 'gt'):
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+    for k, size in enumerate(sizes):
+        ocrd, mand = make_page(rng, size, **kwargs)
+        for sub, text in (('ocr', ocrd), ('gt', mand)):
+            with open(os.path.join(directory, sub, 'p%04d.txt' % k), 'w', encoding='utf-8') as f:
+                f.write(text)
@@ -0,0 +1,66 @@
+# Benchmark of generate_total_results: the three passes of total_results,
+# total_results_counter and total_results_hallucinations against the one
+# pass of total_results_all, on a synthetic set of result files.
+#
+#   python benchmarks/total_results.py [number of files] [threads]
+import sys
+import os
+import io
+import json
+import time
+import random
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import generate_total_results
+
+KEYS = ('total_chrerrs', 'total_chrs', 'cer', 'total_wrderrs', 'total_wrds', 'wer',
+        'unaligned gt whitespaces', 'unaligned ocr whitespaces', 'aligned whitespaces',
+        'tWErrors', 'tWNoos', 'tWSubs', 'tWDels', 'tWIns', 'tWCount')
+CHARS = 'abcdefghijklmnopqrstuvwxyzåäöABCDEFGHIJKLMNOPQRSTUVWXYZÅÄÖ .,-\n'
+
+def write_result_files(n, seed=0):
+    # n final_*_ocr.json files in the current directory, of the size of
+    # a run over a few hundred pages
+    rng = random.Random(seed)
+    for k in range(n):
+        results = {key: rng.randint(1000, 100000) for key in KEYS}
+        results['cer'] = results['total_chrerrs'] / results['total_chrs']
+        results['wer'] = results['total_wrderrs'] / results['total_wrds']
+        confusion = [[rng.choice(CHARS), rng.choice(CHARS + ' '*5), rng.randint(1, 500)] for _ in range(300)]
+        hallucinations = [[f'bib{rng.randint(0, 10**6)}_{j}.txt', rng.choice(('length', 'ngrams'))] for j in range(rng.randint(0, 3))]
+        with open(f'final_{k:05d}_ocr.json', 'w', encoding='utf-8') as f:
+            json.dump({'results': results, 'confusion': confusion, 'hallucinations': hallucinations}, f, ensure_ascii=False)
+
+def timed(f, *args):
+    t = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        r = f(*args)
+    return time.perf_counter() - t, r
+
+def read_outputs():
+    return [open(fn, encoding='utf-8').read() for fn in
+            ('totals_ocr2.txt', 'totals_ocr2_counter_test.txt', 'totals_ocr2_hallucinations_test.txt')]
+
+def main(n=10000, threads=8):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            write_result_files(n)
+            t1, _ = timed(generate_total_results.total_results)
+            t2, _ = timed(generate_total_results.total_results_counter)
+            t3, _ = timed(generate_total_results.total_results_hallucinations)
+            three_pass = read_outputs()
+            print(f'{n} files')
+            print(f'three passes            {t1+t2+t3:.2f}s ({t1:.2f} + {t2:.2f} + {t3:.2f})')
+            for k in (1, threads):
+                t, _ = timed(generate_total_results.total_results_all, k)
+                same = 'same output' if read_outputs() == three_pass else 'OUTPUT DIFFERS'
+                print(f'one pass, {k:2d} threads    {t:.2f}s {same}')
+        finally:
+            os.chdir(cwd)
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,190 @@
+# A confusion matrix of gold standard characters (rows) against the ocr
+# characters they were read as (columns), kept in a dense integer array
+# instead of nested Counters, so that the matrices of many pages can be
+# added up with a few array operations.
+#
+#   matrix = ConfusionMatrix()
+#   matrix.add('ſ', 's')
+#   matrix.add_pairs(['å', 'd'], ['ä', 'b'])
+#   total += matrix
+#   total['ſ']                 # Counter({'s': 1}), as with the Counters
+#   total.most_common('ſ', 5)  # [('s', 1)]
+#   total.save('confusion.npz'); ConfusionMatrix.load('confusion.npz')
+#
+# The characters are single code points, or '' for the missing character
+# of an insertion or deletion.
+import re
+import ast
+from collections import Counter
+from operator import itemgetter
+import numpy as np # ...pip install numpy
+
+class ConfusionMatrix:
+    # counts[i, j] is how often manual character alphabet[i] was read as
+    # ocr character alphabet[j]. The alphabet grows as characters are
+    # added; the arrays then double in size. order[i, j] is the number of
+    # the cell among the cells counted so far (0 for cells never
+    # counted), so that they are listed in the order of the nested
+    # Counters (defaultdict(Counter)) they replace: the rows in the order
+    # they were first counted in, the cells of a row likewise. That
+    # keeps the result files of align.py and generate_total_results.py
+    # the same.
+
+    def __init__(self, capacity=16):
+        self.alphabet = []
+        self.index = {}
+        self.counts = np.zeros((capacity, capacity), dtype=np.int64)
+        self.order = np.zeros((capacity, capacity), dtype=np.int64)
+        self.cells = 0
+
+    def code(self, char):
+        # The index of char in the alphabet, added if it is new
+        k = self.index.get(char)
+        if k is None:
+            k = self.index[char] = len(self.alphabet)
+            self.alphabet.append(char)
+            if k == len(self.counts):
+                self._grow(2*k)
+        return k
+
+    def _grow(self, capacity):
+        n = len(self.counts)
+        for name in ('counts', 'order'):
+            array = np.zeros((capacity, capacity), dtype=np.int64)
+            array[:n,:n] = getattr(self, name)
+            setattr(self, name, array)
+
+    def add(self, m_char, o_char, n=1):
+        i, j = self.code(m_char), self.code(o_char)
+        if not self.order[i, j]:
+            self.cells += 1
+            self.order[i, j] = self.cells
+        self.counts[i, j] += n
+
+    def add_pairs(self, m_chars, o_chars, counts=None):
+        # add for each manual and ocr character of the lists m_chars and
+        # o_chars, with the counts in counts (by default 1 each)
+        for c in sorted(set(m_chars).union(o_chars).difference(self.index)):
+            self.code(c)
+        i = np.fromiter(map(self.index.__getitem__, m_chars), dtype=np.intp, count=len(m_chars))
+        j = np.fromiter(map(self.index.__getitem__, o_chars), dtype=np.intp, count=len(o_chars))
+        counts = np.ones(len(i), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        self._add(i, j, counts)
+
+    def add_triples(self, triples):
+        # add_pairs for a list of [manual char, ocr char, count], as in
+        # the 'confusion' of the result files of align.py
+        self.add_pairs(list(map(itemgetter(0), triples)), list(map(itemgetter(1), triples)), list(map(itemgetter(2), triples)))
+
+    def _add(self, i, j, counts):
+        if not len(i):
+            return
+        # the cells not counted before are numbered in the order they
+        # first come in i, j
+        size = len(self.counts)
+        cells = i*size + j
+        if len(cells) >= size*size // 4:
+            first = np.full(size*size, len(cells))
+            np.minimum.at(first, cells, np.arange(len(cells)))
+            cells = np.nonzero(first < len(cells))[0]
+            first = first[cells]
+        else:
+            cells, first = np.unique(cells, return_index=True)
+        new = self.order.flat[cells] == 0
+        cells = cells[new][np.argsort(first[new], kind='stable')]
+        self.order.flat[cells] = np.arange(self.cells+1, self.cells+1+len(cells))
+        self.cells += len(cells)
+        np.add.at(self.counts, (i, j), counts)
+
+    def merge(self, other):
+        # Add the counts of other to these
+        codes = np.array([self.code(c) for c in other.alphabet], dtype=np.intp)
+        i, j = other._cells()
+        self._add(codes[i], codes[j], other.counts[i, j])
+        return self
+
+    __iadd__ = merge
+
+    def _cells(self):
+        # (i, j) of the cells counted, in the order of the nested Counters
+        k = len(self.alphabet)
+        order = self.order[:k,:k]
+        i, j = np.nonzero(order)
+        first = np.where(order > 0, order, self.cells+1).min(axis=1, initial=self.cells+1)
+        ranks = np.lexsort((order[i, j], first[i]))
+        return i[ranks], j[ranks]
+
+    def triples(self):
+        # [manual char, ocr char, count] for each cell counted
+        i, j = self._cells()
+        return [[self.alphabet[a], self.alphabet[b], n] for a, b, n in zip(i.tolist(), j.tolist(), self.counts[i, j].tolist())]
+
+    def rows(self):
+        # {manual char: Counter({ocr char: count})}, the nested Counters
+        rows = {}
+        for m_char, o_char, n in self.triples():
+            rows.setdefault(m_char, Counter())[o_char] = n
+        return rows
+
+    def items(self):
+        return self.rows().items()
+
+    def __getitem__(self, m_char):
+        k = self.index.get(m_char)
+        if k is None:
+            return Counter()
+        j = np.nonzero(self.order[k,:len(self.alphabet)])[0]
+        j = j[np.argsort(self.order[k, j], kind='stable')]
+        return Counter({self.alphabet[b]: n for b, n in zip(j.tolist(), self.counts[k, j].tolist())})
+
+    def most_common(self, m_char=None, k=None):
+        # The k most common confusions of m_char as [(ocr char, count)],
+        # or without m_char, of all characters as [(manual char, ocr char,
+        # count)]. Ties are in the order of triples.
+        if m_char is not None:
+            return self[m_char].most_common(k)
+        i, j = self._cells()
+        counts = self.counts[i, j]
+        top = np.argsort(-counts, kind='stable')[:k]
+        return [(self.alphabet[a], self.alphabet[b], n) for a, b, n in zip(i[top].tolist(), j[top].tolist(), counts[top].tolist())]
+
+    def to_dict(self):
+        # {manual char: {ocr char: count}}, as JSON
+        return {m_char: dict(counter) for m_char, counter in self.rows().items()}
+
+    @classmethod
+    def from_dict(cls, rows):
+        # From nested dicts (or Counters), e.g. the 'mismatch_counter' of
+        # the records of align.py
+        matrix = cls()
+        matrix.add_triples([(m_char, o_char, n) for m_char, counter in rows.items() for o_char, n in counter.items()])
+        return matrix
+
+    def write_text(self, f, end='\n'):
+        # The text dump of the nested Counters, a line per manual character
+        for m_char, counter in self.items():
+            f.write(f'{m_char} {counter}{end}')
+
+    @classmethod
+    def from_text(cls, text):
+        # From a text dump, e.g. total_results_abbyy_character_level.txt
+        matrix = cls()
+        for m_char, counter in re.findall(r'^(.*?) ?Counter\((\{.*?\})\) ?$', text, re.M):
+            matrix.add_triples([(m_char, o_char, n) for o_char, n in ast.literal_eval(counter).items()])
+        return matrix
+
+    def save(self, file):
+        # Save in numpy's .npz format: the alphabet as code points (-1 for
+        # ''), and the cells counted as rows, columns and counts
+        i, j = self._cells()
+        np.savez_compressed(file, alphabet=np.array([ord(c) if c else -1 for c in self.alphabet], dtype=np.int32),
+                            rows=i.astype(np.int32), cols=j.astype(np.int32), counts=self.counts[i, j])
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            matrix = cls()
+            for c in data['alphabet'].tolist():
+                matrix.code(chr(c) if c >= 0 else '')
+            matrix._add(data['rows'].astype(np.intp), data['cols'].astype(np.intp), data['counts'])
+        return matrix
@@ -0,0 +1,98 @@
+# Reading the corpus from directories or straight from zip archives,
+# without unpacking them. A corpus path is a directory, a zip archive,
+# or a directory in a zip archive, written as the path of the archive
+# followed by the path in it, e.g.
+#
+#   ai_transcripts.zip/ai_transcripts/AFTONBLADET 1827-07-02
+#
+# listfiles, walk, getmtime, getsize and read_text work the same for all
+# of them.
+import os
+import time
+import zipfile
+import functools
+from collections import defaultdict
+
+def _split(path):
+    # (archive, path in the archive) for a path in a zip archive, else
+    # (None, path)
+    path = path.replace(os.sep, '/')
+    k = path.lower().find('.zip/')
+    if k >= 0 and os.path.isfile(path[:k+4]):
+        return path[:k+4], path[k+5:].strip('/')
+    if path.lower().endswith('.zip') and os.path.isfile(path):
+        return path, ''
+    return None, path
+
+def _archive(archive):
+    return _open_archive(archive, os.getpid())
+
+@functools.lru_cache(maxsize=None)
+def _open_archive(archive, pid):
+    # Each archive is opened once per process (an open zip file can not
+    # be shared with processes forked from this one, see align.main).
+    # The index of the archive, the zip central directory, is read once
+    # when it is opened.
+    return zipfile.ZipFile(archive)
+
+@functools.lru_cache(maxsize=None)
+def _index(archive):
+    # The names of the files in each directory of the archive, in the
+    # order they are stored in
+    index = defaultdict(list)
+    for name in _archive(archive).namelist():
+        if not name.endswith('/'):
+            directory, _, filename = name.rpartition('/')
+            index[directory].append(filename)
+    return index
+
+def listfiles(path):
+    # The names of the files in a corpus directory, like os.listdir
+    archive, directory = _split(path)
+    if archive is None:
+        return os.listdir(path)
+    return list(_index(archive).get(directory, []))
+
+def walk(path):
+    # The paths of all files under a corpus directory, relative to it,
+    # with '/' between directories, in the order of os.walk (sorted) or
+    # of the archive
+    archive, directory = _split(path)
+    if archive is None:
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            relative = os.path.relpath(dirpath, path).replace(os.sep, '/')
+            for filename in sorted(filenames):
+                yield filename if relative == '.' else relative + '/' + filename
+    else:
+        prefix = directory + '/' if directory else ''
+        for name in _archive(archive).namelist():
+            if name.startswith(prefix) and not name.endswith('/'):
+                yield name[len(prefix):]
+
+def getmtime(path):
+    # The modification time of a corpus file, for an archive member the
+    # one stored in the archive
+    archive, name = _split(path)
+    if archive is None:
+        return os.path.getmtime(path)
+    return time.mktime(_archive(archive).getinfo(name).date_time + (0, 0, -1))
+
+def getsize(path):
+    # The size in bytes of a corpus file, uncompressed
+    archive, name = _split(path)
+    if archive is None:
+        return os.path.getsize(path)
+    return _archive(archive).getinfo(name).file_size
+
+def read_bytes(path):
+    archive, name = _split(path)
+    if archive is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    return _archive(archive).read(name)
+
+def read_text(path, encoding='utf-8'):
+    # The contents of a corpus file, decoded in one go. Newlines are
+    # left as they are, as with codecs.open.
+    return read_bytes(path).decode(encoding)
@@ -1,39 +1,163 @@
+# Normalization of the corpus texts: the tags of the transcripts
+# (<sw>, <fr>, <i> etc) are removed, newlines made '\n', byte order marks
+# (and, if asked for, soft hyphens within lines) removed, and whitespace
+# at the ends stripped, in one pass over the text (see normalize).
+# align.py reads the texts through it, with the options of OCR and GOLD.
+#
+# Normalized texts can be kept in a cache directory, keyed on the path of
+# the source file and the options, and checked against the modification
+# time and hash of the source, see cached_normalize. To fill in the
+# cache for a whole corpus tree, over all cores:
+#
+#   python data_cleaning.py normalize CACHE --ocr ocr/ --gold transcribed/
+#
+# and then python align.py ... --normalized CACHE.
+#
+# The transcripts with the tags removed can also be written as files
+# of their own, as before:
+#
+#   python data_cleaning.py clean transcribed/WEXJÖBLADET\ 1835-09-18 transcribed/data/clean-transcripts/WEXJÖBLADET\ 1835-09-18
 import os
 import re
-transcript_path = "transcribed/WEXJÖBLADET 1835-09-18" # change this path as needed
+import json
+import hashlib
+import argparse
+import tempfile
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import corpus
+transcript_path = "transcribed/WEXJÖBLADET 1835-09-18" # change this path as needed, may be in a zip archive, see corpus.py
 clean_path = "transcribed/data/clean-transcripts/WEXJÖBLADET 1835-09-18" # change this path as needed
 
-def create_directories():
-    try:
-        os.makedirs(clean_path, exist_ok=True)
-    except OSError:
-        print("%s already exists" % clean_path)
-    else:
-        print("%s created" % clean_path)
+TAGS = r'</?sw>|</?fr>|</? ?i ?>|</?big>|</?small>|</?aq>|</?sc>|</?init>|</? ?b ?>|</?sup>|</?sub>|</?u>|</?v>'
+
+# The options of normalize for the ocr and the gold standard texts. The
+# soft hyphens of the gold standard are kept: score_and_print takes them
+# for a hyphen of the ocr, which it would count as an error without them.
+OCR = {}
+GOLD = {'tags': True, 'bom': True}
+
+NORMALIZE_VERSION = 1 # part of the keys of the cache, change when normalize changes
 
-    for directory in os.listdir(transcript_path):
-        tmp_path = clean_path + directory
-        try:
-            os.mkdir(tmp_path)
-        except OSError:
+def create_directories(transcript_path=transcript_path, clean_path=clean_path):
+    # clean_path, and the directories under it for those under transcript_path
+    directories = sorted({os.path.dirname(name) for name in corpus.walk(transcript_path)})
+    for directory in directories:
+        tmp_path = os.path.join(clean_path, directory) if directory else clean_path
+        if os.path.isdir(tmp_path):
             print("%s already exists" % tmp_path)
         else:
+            os.makedirs(tmp_path)
             print("%s created" % tmp_path)
 
 def clean_text(text):
-    expr = r'</?sw>|</?fr>|</? ?i ?>|</?big>|</?small>|</?aq>|</?sc>|</?init>|</? ?b ?>|</?sup>|</?sub>|</?u>|</?v>'
-    return re.sub(expr, "", text)
+    return re.sub(TAGS, "", text)
 
-def clean():
-    for file_name in os.listdir(transcript_path):
+@functools.lru_cache(maxsize=None)
+def _pattern(tags, bom, soft_hyphens):
+    parts = [r'\r\n?']
+    if tags:
+        parts.append(TAGS)
+    if bom:
+        parts.append('\ufeff')
+    if soft_hyphens:
+        # soft hyphens at the end of a line mark a hyphenation, and are kept
+        parts.append(r'\xad(?![\r\n]|$)')
+    return re.compile('|'.join(parts))
+
+def _replace(match):
+    return '\n' if match.group()[0] == '\r' else ''
+
+def normalize(text, tags=False, bom=False, soft_hyphens=False, strip=True):
+    # text with '\r\n' and '\r' made '\n' and, as asked for, the tags
+    # removed (see clean_text), byte order marks removed and soft hyphens
+    # removed but at the end of lines, in one pass. With strip, the
+    # whitespace at the beginning and end is removed too.
+    text = _pattern(tags, bom, soft_hyphens).sub(_replace, text)
+    return text.strip() if strip else text
+
+def clean(transcript_path=transcript_path, clean_path=clean_path):
+    # Write the transcripts under transcript_path without the tags to the
+    # same place under clean_path (see create_directories)
+    for file_name in corpus.walk(transcript_path):
             tmp_path = transcript_path + '/' + file_name
-            write_file = clean_path + '/' + file_name
-            with open(tmp_path , "r", encoding ="utf-8-sig") as file:
-                contents = file.read()
+            write_file = os.path.join(clean_path, file_name)
+            contents = corpus.read_text(tmp_path, "utf-8-sig")
 
-            clean_contents = clean_text(contents)
+            clean_contents = normalize(contents, tags=True, strip=False)
 
             with open(write_file, 'w', encoding ="utf-8-sig") as file:
                 file.write(clean_contents)
 
-clean()
+def _cache_path(cache, path, options):
+    key = hashlib.sha256(json.dumps([NORMALIZE_VERSION, os.path.abspath(path), sorted(options.items())]).encode('utf-8')).hexdigest()
+    return os.path.join(cache, key[:2], key + '.json')
+
+def cached_normalize(cache, path, **options):
+    # normalize (with options) of the corpus file path, from the cache
+    # directory if it is there for the file as it is now: with the same
+    # modification time, or else the same contents (sha256). Else the
+    # file is read, normalized and stored in the cache.
+    entry_path = _cache_path(cache, path, options)
+    mtime = corpus.getmtime(path)
+    try:
+        with open(entry_path, encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        entry = None
+    if entry is not None and entry['mtime'] == mtime:
+        return entry['text']
+
+    data = corpus.read_bytes(path)
+    digest = hashlib.sha256(data).hexdigest()
+    if entry is None or entry['sha256'] != digest:
+        entry = {'source': path, 'sha256': digest, 'text': normalize(data.decode('utf-8'), **options)}
+    entry['mtime'] = mtime
+
+    # written to a temporary file first, so that processes reading the
+    # cache at the same time never see half an entry
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(entry_path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, entry_path)
+    return entry['text']
+
+def _normalize_file(path, cache, options):
+    cached_normalize(cache, path, **options)
+    return path
+
+def normalize_tree(cache, ocr_paths=(), gold_paths=(), jobs=None):
+    # Fill in the cache for all files under the directories (or
+    # directories in zip archives) ocr_paths and gold_paths, with the
+    # options of OCR and GOLD, in jobs processes (by default one per
+    # core). Returns the number of files.
+    tasks = [(path.rstrip('/') + '/' + name, options) for paths, options in ((ocr_paths, OCR), (gold_paths, GOLD))
+             for path in paths for name in corpus.walk(path)]
+    with ProcessPoolExecutor(jobs) as executor:
+        for n, _ in enumerate(executor.map(_normalize_file, [t[0] for t in tasks], [cache]*len(tasks), [t[1] for t in tasks],
+                                           chunksize=64), start=1):
+            if n % 1000 == 0:
+                print(f'{n}/{len(tasks)}', flush=True)
+    print(f'{len(tasks)} files normalized into {cache}')
+    return len(tasks)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Normalize the corpus texts.')
+    commands = parser.add_subparsers(dest='command')
+    command = commands.add_parser('clean', help='write the transcripts without tags to a directory')
+    command.add_argument('transcript_path', nargs='?', default=transcript_path)
+    command.add_argument('clean_path', nargs='?', default=clean_path)
+    command = commands.add_parser('normalize', help='fill in a cache of normalized texts for align.py --normalized')
+    command.add_argument('cache')
+    command.add_argument('--ocr', nargs='*', default=[], help='directories with ocr files')
+    command.add_argument('--gold', nargs='*', default=[], help='directories with gold standard files')
+    command.add_argument('--jobs', type=int, help='number of processes (by default one per core)')
+    args = parser.parse_args()
+    if args.command == 'normalize':
+        normalize_tree(args.cache, args.ocr, args.gold, args.jobs)
+    else:
+        # without a command, clean the paths above
+        paths = (args.transcript_path, args.clean_path) if args.command else (transcript_path, clean_path)
+        create_directories(*paths)
+        clean(*paths)
@@ -16,50 +16,201 @@
 #
 # Segmenten i pdf:erna sparas som png filer i arbetsmappen.
 #
-# Skriptet spottar ur sig lite info om pdf:en och de extraherade
-# bilderna på stdout (som man kan ignorera så länge allting verkar
-# funka).
+# Flera pdf:er, eller mappar med pdf:er, kan anges på en gång, och
+# fördelas då på flera processer:
+#
+#   python3 extract_segment.py --jobs 8 --out segment/ pdf/ <PDF-FILNAMN> ...
+#
+# Segment som redan sparats (png-filen finns och är nyare än pdf:en)
+# hoppas över, om inte --force anges.
+#
+# Med --pack png (eller --pack raw, för okodade pixlar) sparas segmenten
+# i stället i ett zip-arkiv per pdf, <PDF-NAMN>.zip, se write_packed.
+# Segmenten kan också läsas direkt ur pdf:en utan att sparas alls, med
+# iter_segments.
+#
+# Skriptet skriver en rad per pdf på stdout: antalet segment, hur många
+# som sparades och hoppades över, och tiden det tog. Med --verbose
+# skrivs även rektanglarna för varje segment ut.
 #
 
+import os
 import sys
 import math
+import time
+import argparse
+import json
+import zipfile
+from collections import namedtuple
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import pymupdf # ...pip install pymupdf
 
 
-def extract_segments(fn):
+Segment = namedtuple('Segment', 'id rect data channels')
+
+def segment_filename(fn, i, outdir='.'):
+    return Path(outdir) / (Path(fn).stem+'-%04d.png' % i)
+
+def packed_filename(fn, outdir='.'):
+    return Path(outdir) / (Path(fn).stem+'.zip')
+
+def extract_segments(fn, outdir='.', force=False, verbose=False, pack=None):
+    # Sparar segmenten i pdf:en fn i mappen outdir, och returnerar en
+    # sammanfattning: {'pdf', 'segments', 'saved', 'skipped', 'seconds'}
+    #
+    # Med pack ('png' eller 'raw') sparas segmenten i stället i ett
+    # arkiv per pdf, packed_filename(fn), se write_packed.
+    start = time.perf_counter()
+    doc = pymupdf.Document(fn)
+    page = doc.load_page(0)
+    segment_rects = _segment_rects(page)
+    if verbose:
+        print(*enumerate(segment_rects,start=1), sep='\n')
+        print(page.rect) # hela sidan
+
+    # segment som redan sparats efter att pdf:en ändrades senast görs inte om
+    mtime = os.path.getmtime(fn)
+    todo = list(enumerate(segment_rects, start=1))
+    if pack:
+        if not force and _up_to_date(packed_filename(fn, outdir), mtime):
+            todo = []
+    else:
+        todo = [(i, segment_rect) for i, segment_rect in todo
+                if force or not _up_to_date(segment_filename(fn, i, outdir), mtime)]
+
+    if todo:
+        segments = _crop(doc, page, todo, verbose)
+        if pack:
+            write_packed(packed_filename(fn, outdir), fn, (_encode(segment, pack) for segment in segments), pack)
+        else:
+            for i, _, segment in segments:
+                segment.save(segment_filename(fn, i, outdir))
+
+    return {'pdf': str(fn), 'segments': len(segment_rects), 'saved': len(todo),
+            'skipped': len(segment_rects)-len(todo), 'seconds': time.perf_counter()-start}
+
+def iter_segments(fn, fmt=None):
+    # Segmenten i pdf:en fn, utan att de sparas: en Segment(id, rect,
+    # data, channels) per segment, där id är segmentets nummer (som i
+    # namnet på png-filen), rect dess IRect i bilden och data pixlarna,
+    # rad för rad med channels byte per pixel. Med fmt (t ex 'png') är
+    # data i stället bilden kodad i det formatet, och channels None.
     doc = pymupdf.Document(fn)
     page = doc.load_page(0)
+    for segment in _crop(doc, page, list(enumerate(_segment_rects(page), start=1))):
+        yield _encode(segment, fmt or 'raw')
 
+def _segment_rects(page):
     # Segmenten anges med rektanglar som ritats över bilden i pdf:en. Varje segment omges av tre rektanglar, vi väljer den mittersta som lagom...
-    segment_rects = [path['items'][0][1] for path in page.get_drawings()[1:-1:3]]
-    print(*enumerate(segment_rects,start=1), sep='\n')
-    print(page.rect) # hela sidan
-   
+    return [path['items'][0][1] for path in page.get_drawings()[1:-1:3]]
+
+def _crop(doc, page, todo, verbose=False):
+    # (nummer, IRect, Pixmap) för segmenten i todo, en lista med (nummer,
+    # rektangel). Bilden avkodas en gång, och varje segment kopieras ut
+    # ur den utan att hela bilden kopieras igen.
     img_info = page.get_images()[0]
     img = pymupdf.Pixmap(doc, img_info[0])
-    # print(img)
 
     h_scale = img.height / page.rect.height
     w_scale = img.width / page.rect.width
     assert math.isclose(h_scale, w_scale, rel_tol=.0001)
-   
-    # print(w_scale, h_scale)
-   
+
     scale_matrix = pymupdf.Matrix(h_scale, w_scale)
-   
-    for i, segment_rect in enumerate(segment_rects, start=1):
-        print(i)    
-        print(segment_rect)
-        segment_rect *= scale_matrix
-        print(segment_rect)
-        segment_irect = pymupdf.IRect(segment_rect)+(0,0,1,1)
-        print(segment_irect)
-        segment = pymupdf.Pixmap(img, img.width, img.height, segment_irect)
-        segment.save(Path(fn).stem+'-%04d.png' % i)
-        print()
-
-   
+
+    for i, segment_rect in todo:
+        segment_irect = (pymupdf.IRect(segment_rect*scale_matrix)+(0,0,1,1)) & img.irect
+        if verbose:
+            print(i, segment_rect, segment_irect)
+        segment = pymupdf.Pixmap(img.colorspace, segment_irect, img.alpha)
+        segment.copy(img, segment_irect)
+        yield i, segment_irect, segment
+
+def _encode(segment, fmt):
+    i, irect, pixmap = segment
+    if fmt == 'raw':
+        return Segment(i, irect, pixmap.samples, pixmap.n)
+    return Segment(i, irect, pixmap.tobytes(fmt), None)
+
+def write_packed(path, fn, segments, fmt='png'):
+    # Sparar segmenten (Segment från iter_segments, med data i formatet
+    # fmt) i ett zip-arkiv utan komprimering, vars register över filerna
+    # ger var varje segment börjar. Segmenten heter som png-filerna (med
+    # ändelsen .raw för 'raw'), och index.json listar dem med nummer,
+    # rektangel och antal kanaler. Arkivet skrivs färdigt under ett
+    # annat namn först, så att ett avbrutet arkiv aldrig ser färdigt ut.
+    index = []
+    tmp = Path(str(path) + '.tmp')
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as archive:
+        for segment in segments:
+            name = Path(fn).stem+'-%04d.%s' % (segment.id, 'raw' if fmt == 'raw' else fmt)
+            archive.writestr(name, segment.data)
+            index.append({'id': segment.id, 'name': name, 'rect': list(segment.rect), 'channels': segment.channels})
+        archive.writestr('index.json', json.dumps({'pdf': Path(fn).name, 'format': fmt, 'segments': index}))
+    os.replace(tmp, path)
+
+def read_packed(path):
+    # Segmenten i ett arkiv från write_packed, som Segment(id, rect,
+    # data, channels) i samma ordning som de sparades
+    with zipfile.ZipFile(path) as archive:
+        index = json.loads(archive.read('index.json'))
+        for entry in index['segments']:
+            yield Segment(entry['id'], pymupdf.IRect(entry['rect']), archive.read(entry['name']), entry['channels'])
+
+def _up_to_date(path, mtime):
+    try:
+        return os.path.getmtime(path) >= mtime
+    except OSError:
+        return False
+
+def _extract(fn, outdir, force, verbose, pack):
+    # extract_segments, med felet i sammanfattningen om det går fel, så
+    # att en trasig pdf inte stoppar resten
+    try:
+        return extract_segments(fn, outdir, force, verbose, pack)
+    except Exception as e:
+        return {'pdf': str(fn), 'error': f'{type(e).__name__}: {e}'}
+
+def pdf_files(paths):
+    # pdf-filerna i paths, som är pdf-filer eller mappar med pdf-filer
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            yield from sorted(p for p in path.iterdir() if p.suffix.lower() == '.pdf')
+        else:
+            yield path
+
+def extract_all(paths, outdir='.', jobs=None, force=False, verbose=False, pack=None):
+    # extract_segments för alla pdf:er i paths (se pdf_files), i jobs
+    # processer (som standard en per kärna). Skriver en rad per pdf och
+    # returnerar sammanfattningarna, i samma ordning som pdf:erna.
+    os.makedirs(outdir, exist_ok=True)
+    fns = list(pdf_files(paths))
+    summaries = []
+    with ProcessPoolExecutor(jobs) as executor:
+        for summary in executor.map(_extract, fns, [outdir]*len(fns), [force]*len(fns), [verbose]*len(fns), [pack]*len(fns)):
+            print(_summary_line(summary), flush=True)
+            summaries.append(summary)
+    return summaries
+
+def _summary_line(summary):
+    if 'error' in summary:
+        return f"{summary['pdf']}: FEL {summary['error']}"
+    return (f"{summary['pdf']}: {summary['segments']} segment, {summary['saved']} sparade, "
+            f"{summary['skipped']} överhoppade ({summary['seconds']:.2f} s)")
+
 
 if __name__=="__main__":
-    extract_segments(sys.argv[1])
+    parser = argparse.ArgumentParser(description='Spara segmenten i pdf:er som png-filer.')
+    parser.add_argument('pdfs', nargs='+', help='pdf-filer, eller mappar med pdf-filer')
+    parser.add_argument('--out', default='.', help='mapp att spara segmenten i (arbetsmappen som standard)')
+    parser.add_argument('--jobs', type=int, help='antal processer (en per kärna som standard)')
+    parser.add_argument('--force', action='store_true', help='spara även segment som redan sparats')
+    parser.add_argument('--pack', choices=('png', 'raw'),
+                        help='spara segmenten i ett zip-arkiv per pdf, som png eller okodade pixlar')
+    parser.add_argument('--verbose', action='store_true', help='skriv ut rektanglarna för varje segment')
+    args = parser.parse_args()
+    summaries = extract_all(args.pdfs, args.out, args.jobs, args.force, args.verbose, args.pack)
+    failed = [s for s in summaries if 'error' in s]
+    print(f"{len(summaries)} pdf:er, {sum(s.get('saved', 0) for s in summaries)} segment sparade, {len(failed)} fel")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,128 @@
+# The manifest of a corpus: the ocr and gold standard files paired up
+# by the page they are of, with their sizes and an estimate of what
+# aligning them costs. align.main evaluates the pairs of the manifest.
+#
+#   python manifest.py OCRDIR GTDIR [manifest.json]
+#
+# prints the number of pairs, the estimated cost and the files without
+# a counterpart (orphans), and with a filename writes the manifest there
+# as JSON.
+#
+# Files are paired by page_key, which reads the newspaper, date and
+# segment from the names of the segments (see extract_segment.py), e.g.
+#
+#   AFTONBLADET 1827-07-02_1-0004.txt               AFTONBLADET/1827-07-02/1-0004
+#   AFTONBLADET 1827-07-02/image_aftonbladet1-0004.txt  AFTONBLADET/1827-07-02/1-0004
+#   bib13991099_18690809_0_1402_0004_018.txt        bib13991099/1869-08-09/0004_018
+#
+# (the paper and date of the image_ names are those of their directory),
+# and otherwise is the name without extension and a suffix such as
+# '_ocr' or '_gt'. The bib names have no name of the paper and the
+# segments numbered otherwise, so they pair only with bib names.
+#
+# If no file pairs up by key, the files are paired in the order of their
+# names, with a warning in the summary.
+import os
+import re
+import sys
+import json
+import corpus
+
+NAMED = re.compile(r'^(?P<paper>.+?) (?P<date>\d{4}-\d{2}-\d{2})_(?P<segment>\d+-\d+)')
+BIB = re.compile(r'^(?P<paper>bib\d+)_(?P<date>\d{8})_.*?(?P<segment>\d{4}_\d{3})$')
+IMAGE = re.compile(r'^image_\D+?(?P<segment>\d+-\d+)$')
+DIRECTORY = re.compile(r'^(?P<paper>.+?) (?P<date>\d{4}-\d{2}-\d{2})$')
+SUFFIX = re.compile(r'[_.-](ocr|ai|abbyy|chatgpt|gt|truth|gold|clean)$', re.I)
+
+def page_key(filename, directory=''):
+    # The newspaper/date/segment of a file, by its name and that of the
+    # directory it is in (which may also be part of filename)
+    stem = SUFFIX.sub('', os.path.splitext(os.path.basename(filename))[0])
+    m = NAMED.match(stem)
+    if m:
+        return f"{m['paper']}/{m['date']}/{m['segment']}"
+    m = IMAGE.match(stem)
+    d = DIRECTORY.match(os.path.basename(os.path.dirname(filename) or directory.rstrip('/')))
+    if m and d:
+        return f"{d['paper']}/{d['date']}/{m['segment']}"
+    m = BIB.match(stem)
+    if m:
+        date = m['date']
+        return f"{m['paper']}/{date[:4]}-{date[4:6]}-{date[6:]}/{m['segment']}"
+    return stem
+
+def build(ocr_paths, truth_paths):
+    # The manifest of the files in the corpus directories ocr_paths and
+    # truth_paths (which may be in zip archives, see corpus.py):
+    #   pairs:      for each page with both files, sorted by key,
+    #               {key, ocr, truth, ocr_size, truth_size, cost}, where
+    #               cost is ocr_size*truth_size, the number of cells of
+    #               the alignment matrix in bytes rather than characters
+    #   orphans:    {ocr: [...], truth: [...]}, the files without a
+    #               counterpart
+    #   duplicates: {ocr: [...], truth: [...]}, the files with the key of
+    #               another file on the same side, which are left out
+    #   paired_by:  'key', or 'name' if no file pairs up by key but there
+    #               are as many ocr files as gold standard files, which
+    #               are then paired in the order of their names, as
+    #               align.main used to
+    sides = {}
+    duplicates = {}
+    for side, path in (('ocr', ocr_paths), ('truth', truth_paths)):
+        sides[side] = {}
+        duplicates[side] = []
+        for filename in sorted(corpus.listfiles(path)):
+            key = page_key(filename, path)
+            if key in sides[side]:
+                duplicates[side].append(filename)
+            else:
+                sides[side][key] = filename
+    keys = sorted(sides['ocr'].keys() & sides['truth'].keys())
+    paired_by = 'key'
+    if keys:
+        pairs = [(key, sides['ocr'][key], sides['truth'][key]) for key in keys]
+    elif len(sides['ocr']) == len(sides['truth']):
+        pairs = [(page_key(o, ocr_paths), o, t) for o, t in zip(sorted(sides['ocr'].values()), sorted(sides['truth'].values()))]
+        paired_by = 'name'
+    else:
+        pairs = []
+    paired = {'ocr': {o for _, o, _ in pairs}, 'truth': {t for _, _, t in pairs}}
+
+    manifest = {'ocr_paths': ocr_paths, 'truth_paths': truth_paths, 'pairs': [], 'paired_by': paired_by, 'duplicates': duplicates,
+                'orphans': {side: sorted(f for f in sides[side].values() if f not in paired[side]) for side in sides}}
+    for key, ocrdfile, mandfile in pairs:
+        ocr_size = corpus.getsize(os.path.join(ocr_paths, ocrdfile))
+        truth_size = corpus.getsize(os.path.join(truth_paths, mandfile))
+        manifest['pairs'].append({'key': key, 'ocr': ocrdfile, 'truth': mandfile,
+                                  'ocr_size': ocr_size, 'truth_size': truth_size, 'cost': ocr_size*truth_size})
+    return manifest
+
+def schedule(manifest):
+    # The indices of the pairs of manifest, the most costly first, so
+    # that a run over several processes does not end waiting for one big
+    # page started last
+    pairs = manifest['pairs']
+    return sorted(range(len(pairs)), key=lambda k: -pairs[k]['cost'])
+
+def summary(manifest):
+    # Printable lines about manifest
+    pairs = manifest['pairs']
+    lines = [f"{len(pairs)} pairs, estimated cost {sum(p['cost'] for p in pairs):.3g} cells"]
+    if manifest['paired_by'] == 'name' and pairs:
+        lines.append(f"warning: no file names of the same page in {manifest['ocr_paths']} and {manifest['truth_paths']},"
+                     " the files are paired in the order of their names")
+    if pairs:
+        biggest = max(pairs, key=lambda p: p['cost'])
+        lines.append(f"most costly: {biggest['ocr']} {biggest['truth']} ({biggest['cost']:.3g} cells)")
+    for side in ('ocr', 'truth'):
+        for kind in ('orphans', 'duplicates'):
+            if manifest[kind][side]:
+                lines.append(f"{len(manifest[kind][side])} {side} {kind}: " + ', '.join(manifest[kind][side]))
+    return lines
+
+if __name__ == '__main__':
+    manifest = build(sys.argv[1], sys.argv[2])
+    print(*summary(manifest), sep='\n')
+    if len(sys.argv) > 3:
+        with open(sys.argv[3], 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
@@ -0,0 +1,199 @@
+# The alignments and scores of align.py checked against those of the
+# code before the engines (see baseline.py), on pages of the shipped
+# transcripts (ai_transcripts.zip) with ocr errors made up by
+# benchmarks/pages.py.
+#
+#   python -m pytest tests
+import os
+import sys
+import io
+import random
+import zipfile
+import contextlib
+import functools
+from collections import Counter
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+import align
+import data_cleaning
+import pages
+import baseline
+
+TRANSCRIPTS = os.path.join(ROOT, 'ai_transcripts.zip')
+PAGE_LENGTH = 400 # characters of each transcript, the baseline fills in the full matrix in python
+
+MODES = sorted(align.MODES.items(), key=lambda item: str(item[0]))
+
+@functools.lru_cache(maxsize=None)
+def page_pairs(n=4, seed=0):
+    # [(name, ocrd, mand)]: n transcripts as the gold standard, with ocr
+    # errors at rates from 2 to 15%, and for every other page a few lines
+    # of junk in front of the ocr, for the z restarts and -sb
+    rng = random.Random(seed)
+    table = pages.confusions()
+    with zipfile.ZipFile(TRANSCRIPTS) as archive:
+        names = sorted(name for name in archive.namelist() if name.endswith('.txt'))
+        pairs = []
+        for k, name in enumerate(rng.sample(names, n)):
+            mand = data_cleaning.normalize(archive.read(name).decode('utf-8'), **data_cleaning.GOLD)[:PAGE_LENGTH].strip()
+            ocrd = pages.make_ocr(rng, mand, (0.02, 0.05, 0.1, 0.15)[k % 4], table)
+            if k % 2:
+                ocrd = pages.make_text(rng, 80, 25) + '\n' + ocrd
+            pairs.append((os.path.basename(name), ocrd, mand))
+    return pairs
+
+@functools.lru_cache(maxsize=None)
+def baseline_alignment(k, mode):
+    _, ocrd, mand = page_pairs()[k]
+    options = align.MODES[mode]
+    return baseline.charalign(ocrd, mand, options.stripbeg, options.stripend)
+
+def cost(ocrd, mand, ocrdrec, mandrec):
+    # The score of an alignment, as charalign counts it: the leading
+    # deletes on the top margin cost as there (nothing up to a newline),
+    # the rest as in the matrix
+    top, _ = align._top_margin(ocrd, len(ocrd))
+    dels = align._deletions(ocrd)
+    i = ocrd.find(''.join(ocrdrec))
+    total = 0
+    on_top = True
+    for o, m in zip(ocrdrec, mandrec):
+        if on_top and not m:
+            i += 1
+            continue
+        if on_top:
+            total += top[i]
+            on_top = False
+        if o and m:
+            total += align._substitution(o, m)
+            i += 1
+        elif o:
+            i += 1
+            total += dels[i]
+        else:
+            total += 1
+    return total + (top[i] if on_top else 0)
+
+CASES = [(k, mode) for k in range(4) for mode, _ in MODES]
+
+@pytest.mark.parametrize('k,mode', CASES)
+def test_engines_same_alignment(k, mode):
+    # the full matrix with bit flags, numpy, banded and bounded give the
+    # alignment of the string backpointers
+    _, ocrd, mand = page_pairs()[k]
+    options = align.MODES[mode]
+    expected = baseline_alignment(k, mode)
+    assert align.charalign(ocrd, mand, options=options) == expected
+    assert align.charalign(ocrd, mand, engine='numpy', options=options) == expected
+    assert align.charalign(ocrd, mand, band=10, options=options) == expected
+    score = align.alignment_score(ocrd, mand, options)
+    assert align.charalign(ocrd, mand, max_cost=score+1e-6, options=options) == expected
+    assert align.charalign(ocrd, mand, max_cost=score-0.5, options=options) is None
+
+@pytest.mark.parametrize('k,mode', CASES)
+def test_linear_same_score(k, mode):
+    # the linear engine may pick another of the best alignments
+    _, ocrd, mand = page_pairs()[k]
+    options = align.MODES[mode]
+    expected = cost(ocrd, mand, *baseline_alignment(k, mode))
+    assert cost(ocrd, mand, *align.charalign(ocrd, mand, engine='linear', options=options)) == pytest.approx(expected)
+    assert align.alignment_score(ocrd, mand, options) == pytest.approx(expected)
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_options_from_one_fill(engine):
+    _, ocrd, mand = page_pairs()[1]
+    options = [options for _, options in MODES]
+    assert align.charalign(ocrd, mand, engine=engine, options=options) == [baseline_alignment(1, mode) for mode, _ in MODES]
+
+@pytest.mark.parametrize('k,mode', CASES)
+def test_score_and_print(k, mode):
+    # the counts, the marked lines, the mismatches and what is printed,
+    # from the lists and from an Alignment
+    _, ocrd, mand = page_pairs()[k]
+    options = align.MODES[mode]
+    ocrdrec, mandrec = baseline_alignment(k, mode)
+    printed = io.StringIO()
+    with contextlib.redirect_stdout(printed):
+        expected = baseline.score_and_print(list(ocrdrec), list(mandrec), options.newlines_in_man)
+    expected_mismatches = {m_char: dict(counter) for m_char, counter in expected[8].items()}
+
+    compact = align.Alignment.from_lists(ocrdrec, mandrec, ocrd, mand)
+    for alignment in ((ocrdrec, mandrec), (compact, None)):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = align.score_and_print(*alignment, options=options)
+        assert result[:8] == expected[:8]
+        assert result[8].to_dict() == expected_mismatches
+        assert output.getvalue() == printed.getvalue()
+
+        wrong_words = Counter()
+        quiet = align.score_and_print(*alignment, options=options, quiet=True, markup=False, wrong_words=wrong_words)
+        assert quiet[:7] == expected[:7]
+        # the words with an error marked, but not the missing ones (only °°)
+        marked = Counter(w.replace('°', '') for line in expected[7] for w in line.split() if '°°' in w)
+        del marked['']
+        del wrong_words['']
+        assert wrong_words == marked
+
+@pytest.mark.parametrize('k,mode', CASES)
+def test_worderrors(k, mode):
+    _, ocrd, mand = page_pairs()[k]
+    ocrdrec, mandrec = baseline_alignment(k, mode)
+    expected = baseline.worderrors(list(ocrdrec), list(mandrec))
+    compact = align.Alignment.from_lists(ocrdrec, mandrec, ocrd, mand)
+    assert align.worderrors(ocrdrec, mandrec) == expected
+    assert align.worderrors(compact) == expected
+    assert align.worderrors_from_alignment(compact) == align.worderrors_from_alignment(ocrdrec, mandrec)
+
+@pytest.mark.parametrize('k', range(4))
+def test_alignment_round_trip(k):
+    _, ocrd, mand = page_pairs()[k]
+    ocrdrec, mandrec = baseline_alignment(k, '-sb')
+    compact = align.charalign(ocrd, mand, options=align.MODES['-sb'], compact=True)
+    assert compact.to_lists() == (ocrdrec, mandrec)
+    assert compact.ocrd_text() == ''.join(ocrdrec)
+    assert compact.mand_text() == ''.join(mandrec)
+    assert [k for k, o in enumerate(ocrdrec) if not o] == compact.ocrd_gaps().tolist()
+    assert [k for k, m in enumerate(mandrec) if not m] == compact.mand_gaps().tolist()
+    packed = align.pack_alignment(ocrd, ocrdrec, mandrec)
+    assert packed == compact.pack()
+    assert align.unpack_alignment(ocrd, mand, packed) == (ocrdrec, mandrec)
+
+@pytest.mark.parametrize('mand,ocrd', [('i Stock\xadholm\n', 'i Stock-holm\n'), ('\ufeff<i>Stock\xadholm</i>\r\n', 'Stock-holm\n')])
+def test_normalized_soft_hyphens(mand, ocrd):
+    # a soft hyphen of the gold standard is a hyphen of the ocr (the
+    # last line of a page is not counted, hence the one after)
+    ocrd, mand = ocrd + 'idag', mand + 'idag'
+    ocrd = data_cleaning.normalize(ocrd, **data_cleaning.OCR)
+    mand = data_cleaning.normalize(mand, **data_cleaning.GOLD)
+    charactererrors, characters, worderrors = align.score_and_print(*align.charalign(ocrd, mand), quiet=True)[:3]
+    assert (charactererrors, worderrors) == (0, 0) and characters > 0
+
+@pytest.mark.parametrize('ocrdrec,mandrec', [
+    baseline.charalign('Herr ,\nFru', 'Herr  Fru'),
+    (['H', ' ', ',', '\n'], ['H', ' ', '', ' ']),
+    (['\n', '', '\n', ''], ['\n', 'a', ' ', ' ']),
+    (['', '\n', '', '', '', ''], ['a', ' ', '-', '-', 'b', '\n']),
+])
+def test_score_and_print_last_word(ocrdrec, mandrec):
+    # the word after the last manual whitespace of the scored columns,
+    # empty or not
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = baseline.score_and_print(list(ocrdrec), list(mandrec))
+    assert align.score_and_print(ocrdrec, mandrec, quiet=True)[:7] == expected[:7]
+
+ENGINES = [{}, {'engine': 'numpy'}, {'engine': 'linear'}, {'engine': 'anchored'}, {'band': 2}, {'max_cost': 10}]
+
+@pytest.mark.parametrize('kwargs', ENGINES)
+@pytest.mark.parametrize('ocrd,mode,start', [('abc\nabc', '-sb', 4), ('abc\nabc', None, 0), ('abc\nx\nabc', '-sb', 6), ('abc\nabc\nx', '-se', 0)])
+def test_compact_start(kwargs, ocrd, mode, start):
+    # where the alignment is, not the first place its text occurs
+    compact = align.charalign(ocrd, 'abc', options=align.MODES[mode], compact=True, **kwargs)
+    assert compact.ocrd_start == start
+    assert [ocrd[i] for i in compact.ocrd_index.tolist() if i >= 0] == [c for c in compact.ocrd_text()]
+    assert compact.ocrd_index.tolist()[-3:] == [start+len(compact)-3, start+len(compact)-2, start+len(compact)-1]
+    assert align.Alignment.unpack(ocrd, 'abc', compact.pack()).ocrd_index.tolist() == compact.ocrd_index.tolist()
+    assert align.pack_alignment(ocrd, *compact.to_lists(), compact.ocrd_start) == compact.pack()
@@ -0,0 +1,47 @@
+# The page keys of manifest.py for the naming schemes of the corpus, and
+# the pairing by them.
+#
+#   python -m pytest tests
+import os
+import sys
+import zipfile
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+import manifest
+
+TRANSCRIPTS = os.path.join(ROOT, 'ai_transcripts.zip')
+
+@pytest.mark.parametrize('filename,directory,key', [
+    ('AFTONBLADET 1827-07-02_1-0004.txt', '', 'AFTONBLADET/1827-07-02/1-0004'),
+    ('AFTONBLADET 1827-07-02_1-0004_ocr.txt', '', 'AFTONBLADET/1827-07-02/1-0004'),
+    ('image_aftonbladet1-0004.txt', 'ai_transcripts.zip/ai_transcripts/AFTONBLADET 1827-07-02', 'AFTONBLADET/1827-07-02/1-0004'),
+    ('AFTONBLADET 1827-07-02/image_aftonbladet1-0004.txt', '', 'AFTONBLADET/1827-07-02/1-0004'),
+    ('image_aftonbladet1-0004.txt', '', 'image_aftonbladet1-0004'),
+    ('bib13991099_18690809_0_1402_0004_018.txt', '', 'bib13991099/1869-08-09/0004_018'),
+    ('p003.txt', '', 'p003'),
+])
+def test_page_key(filename, directory, key):
+    assert manifest.page_key(filename, directory) == key
+
+def test_transcripts_keyed():
+    # every page of the shipped transcripts has a key of the common form
+    with zipfile.ZipFile(TRANSCRIPTS) as archive:
+        names = [name for name in archive.namelist() if name.endswith('.txt')]
+    assert all(manifest.page_key(name).count('/') == 2 for name in names)
+
+def test_paired_by(tmp_path):
+    for side, names in (('ocr', ['AFTONBLADET 1827-07-02_1-0001.txt', 'AFTONBLADET 1827-07-02_1-0002.txt']),
+                        ('gt/AFTONBLADET 1827-07-02', ['image_aftonbladet1-0001.txt', 'image_aftonbladet1-0002.txt']),
+                        ('bib', ['bib1_18270702_0_1_0001_001.txt', 'bib1_18270702_0_1_0002_001.txt'])):
+        os.makedirs(tmp_path / side)
+        for name in names:
+            (tmp_path / side / name).write_text('text')
+    by_key = manifest.build(str(tmp_path / 'ocr'), str(tmp_path / 'gt/AFTONBLADET 1827-07-02'))
+    assert by_key['paired_by'] == 'key'
+    assert [pair['truth'] for pair in by_key['pairs']] == ['image_aftonbladet1-0001.txt', 'image_aftonbladet1-0002.txt']
+    assert not any(line.startswith('warning') for line in manifest.summary(by_key))
+    by_name = manifest.build(str(tmp_path / 'ocr'), str(tmp_path / 'bib'))
+    assert by_name['paired_by'] == 'name'
+    assert any(line.startswith('warning') for line in manifest.summary(by_name))